@@ -2,3 +2,7 @@ from . import math_functions
 from . import Obstacle
 from . import path_animation
 from . import path_search
+from . import prm
+from . import path_smoothing
+from . import grid_planner
+from . import rrt
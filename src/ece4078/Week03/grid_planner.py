@@ -0,0 +1,336 @@
+import math
+import heapq
+from array import array
+import numpy as np
+from matplotlib.path import Path
+from .Obstacle import Circle
+
+SQRT2 = math.sqrt(2)
+
+
+class OccupancyGrid:
+    """
+    Occupancy grid rasterized from Polygon, Rectangle and Circle obstacles
+
+    A cell is occupied if its centre lies inside an obstacle or within robot_radius of it.
+    Cell (row, col) is centred at (x_min + (col + 0.5) * resolution, y_min + (row + 0.5) * resolution).
+
+    This class has the following attributes
+
+    - resolution: Side of a cell in world units
+    - bounds: ((x_min, x_max), (y_min, y_max)) covered by the grid
+    - shape: (number of rows, number of columns)
+    - packed: Occupancy packed 8 cells per byte along each row (see np.packbits)
+
+    """
+
+    # Number of grid rows rasterized at once, to bound memory use
+    ROW_BLOCK_SIZE = 256
+
+    def __init__(self, obstacles, resolution=0.5, robot_radius=0.0, bounds=None):
+        """
+        :param obstacles: List of Polygon, Rectangle or Circle obstacles
+        :param resolution: Side of a cell in world units
+        :param robot_radius: Distance by which obstacles are inflated
+        :param bounds: ((x_min, x_max), (y_min, y_max)), the bounding box of the inflated obstacles by default
+        """
+        self.resolution = resolution
+        if bounds is None:
+            corners = np.vstack([np.vstack((obs.center - obs.radius, obs.center + obs.radius))
+                                 if isinstance(obs, Circle) else obs.vertices for obs in obstacles])
+            low, high = corners.min(axis=0) - robot_radius, corners.max(axis=0) + robot_radius
+            bounds = ((low[0], high[0]), (low[1], high[1]))
+        self.bounds = bounds
+        (x_min, x_max), (y_min, y_max) = bounds
+        self.shape = (max(int(math.ceil((y_max - y_min) / resolution)), 1),
+                      max(int(math.ceil((x_max - x_min) / resolution)), 1))
+
+        height, width = self.shape
+        xs = x_min + (np.arange(width) + 0.5) * resolution
+        self.packed = np.zeros((height, (width + 7) // 8), dtype=np.uint8)
+        for begin in range(0, height, self.ROW_BLOCK_SIZE):
+            ys = y_min + (np.arange(begin, min(begin + self.ROW_BLOCK_SIZE, height)) + 0.5) * resolution
+            centres = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+            occupied = np.zeros(len(centres), dtype=bool)
+            for obs in obstacles:
+                occupied |= self.__rasterize__(obs, centres, robot_radius)
+            self.packed[begin:begin + len(ys)] = np.packbits(occupied.reshape(len(ys), width), axis=1)
+
+    @staticmethod
+    def __rasterize__(obstacle, points, robot_radius):
+        """
+        :param obstacle: Polygon, Rectangle or Circle
+        :param points: Array with one point per row
+        :param robot_radius: Distance by which the obstacle is inflated
+        :return: Boolean array, True for the points inside the inflated obstacle
+        """
+        if isinstance(obstacle, Circle):
+            return np.linalg.norm(points - obstacle.center, axis=1) <= obstacle.radius + robot_radius
+
+        vertices = np.asarray(obstacle.vertices, dtype=float)
+        inside = Path(vertices).contains_points(points)
+        if robot_radius > 0:
+            # Distance from every point to every edge of the polygon
+            for start, end in zip(vertices, np.roll(vertices, -1, axis=0)):
+                direction = end - start
+                length_sq = direction @ direction
+                t = np.clip((points - start) @ direction / (length_sq if length_sq > 0 else 1.0), 0, 1)
+                inside |= np.linalg.norm(points - start - t[:, None] * direction, axis=1) <= robot_radius
+        return inside
+
+    @property
+    def occupancy(self):
+        """
+        :return: Boolean array with the occupancy of every cell, with dimensions rows x columns
+        """
+        return np.unpackbits(self.packed, axis=1, count=self.shape[1]).astype(bool)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def world_to_cell(self, points):
+        """
+        :param points: Point, or array with one point per row
+        :return: tuple (rows, cols) of the cells containing the points
+        """
+        points = np.asarray(points, dtype=float)
+        (x_min, _), (y_min, _) = self.bounds
+        cols = np.floor((points[..., 0] - x_min) / self.resolution).astype(np.int64)
+        rows = np.floor((points[..., 1] - y_min) / self.resolution).astype(np.int64)
+        return rows, cols
+
+    def cell_to_world(self, rows, cols):
+        """
+        :param rows: Row of every cell
+        :param cols: Column of every cell
+        :return: Array with the centre of every cell, one per row
+        """
+        (x_min, _), (y_min, _) = self.bounds
+        return np.column_stack((x_min + (np.asarray(cols) + 0.5) * self.resolution,
+                                y_min + (np.asarray(rows) + 0.5) * self.resolution))
+
+    def is_free(self, points):
+        """
+        :param points: Point, or array with one point per row
+        :return: Whether every point lies in a free cell inside the grid
+        """
+        rows, cols = self.world_to_cell(points)
+        height, width = self.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        rows, cols = np.where(inside, rows, 0), np.where(inside, cols, 0)
+        bits = (self.packed[rows, cols >> 3] >> (7 - (cols & 7))) & 1
+        return inside & (bits == 0)
+
+    def padded_occupancy(self):
+        """
+        :return: Occupancy as bytes, one per cell, row by row with a border of occupied cells around the grid
+            (so moves never need bounds checks), and the row length of that layout
+        """
+        padded = np.pad(self.occupancy, 1, constant_values=True)
+        return padded.astype(np.uint8).tobytes(), padded.shape[1]
+
+
+def _search_setup(grid, start, goal):
+    """
+    :return: Padded occupancy and row length, flat indices of the start and goal cells (None if not free)
+    """
+    if not np.all(grid.is_free(np.array([start, goal], dtype=float))):
+        return None
+    occupied, row_length = grid.padded_occupancy()
+    rows, cols = grid.world_to_cell(np.array([start, goal], dtype=float))
+    idx_start, idx_goal = ((rows + 1) * row_length + cols + 1).tolist()
+    return occupied, row_length, idx_start, idx_goal
+
+
+def _octile_distance(idx, idx_goal, row_length):
+    """
+    :return: Length of the shortest 8-connected move sequence between two cells on an empty grid
+    """
+    d_row, d_col = divmod(idx, row_length)
+    g_row, g_col = divmod(idx_goal, row_length)
+    d_row, d_col = abs(d_row - g_row), abs(d_col - g_col)
+    return max(d_row, d_col) + (SQRT2 - 1) * min(d_row, d_col)
+
+
+def _grid_path(grid, cells, row_length, start, goal):
+    """
+    :param cells: Flat padded indices of the cells from start to goal
+    :return: Array with one point per row: start, centres of the cells in between, goal
+    """
+    rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), row_length)
+    points = grid.cell_to_world(rows - 1, cols - 1)[1:-1]
+    return np.vstack((np.asarray(start, dtype=float), points, np.asarray(goal, dtype=float)))
+
+
+def _trace_cells(parents, idx_goal):
+    """
+    :return: Flat indices of the cells from the root of the search to idx_goal
+    """
+    cells = [idx_goal]
+    while parents[cells[-1]] != -1:
+        cells.append(parents[cells[-1]])
+    return cells[::-1]
+
+
+def grid_a_star(grid, start, goal, stats=None):
+    """
+    A* over the free cells of an occupancy grid, with 8-connected moves (diagonal moves only between cells whose
+    two shared neighbours are free). Open and closed sets are arrays indexed by cell
+    :param grid: OccupancyGrid
+    :param start: Start position in world coordinates
+    :param goal: Goal position in world coordinates
+    :param stats: If a dict is given, its 'expanded' entry is set to the number of expanded cells
+    :return: Path in world coordinates as an array with one point per row, from start to goal (empty if the goal
+        cannot be reached), as used by animate_path_bug1
+    """
+    setup = _search_setup(grid, start, goal)
+    if setup is None:
+        return np.zeros((0, 2))
+    occupied, row_length, idx_start, idx_goal = setup
+
+    n = len(occupied)
+    costs = array('d', [math.inf]) * n
+    parents = array('l', [-1]) * n
+    closed = bytearray(n)
+    straight = (1, -1, row_length, -row_length)
+    diagonal = ((1, row_length), (1, -row_length), (-1, row_length), (-1, -row_length))
+
+    costs[idx_start] = 0.0
+    heap = [(_octile_distance(idx_start, idx_goal, row_length), 0.0, idx_start)]
+    expanded = 0
+    found = False
+    while heap:
+        _, cost, idx = heapq.heappop(heap)
+        if closed[idx]:
+            continue
+        closed[idx] = 1
+        expanded += 1
+        if idx == idx_goal:
+            found = True
+            break
+
+        moves = [(idx + step, 1.0) for step in straight if not occupied[idx + step]]
+        moves += [(idx + a + b, SQRT2) for a, b in diagonal
+                  if not (occupied[idx + a] or occupied[idx + b] or occupied[idx + a + b])]
+        for n_idx, step_cost in moves:
+            n_cost = cost + step_cost
+            if not closed[n_idx] and n_cost < costs[n_idx]:
+                costs[n_idx] = n_cost
+                parents[n_idx] = idx
+                heapq.heappush(heap, (n_cost + _octile_distance(n_idx, idx_goal, row_length), n_cost, n_idx))
+
+    if stats is not None:
+        stats['expanded'] = expanded
+    if not found:
+        return np.zeros((0, 2))
+    return _grid_path(grid, _trace_cells(parents, idx_goal), row_length, start, goal)
+
+
+def jump_point_search(grid, start, goal, stats=None):
+    """
+    Jump Point Search over the free cells of an occupancy grid, with the same moves and path costs as grid_a_star.
+    Only jump points are put in the open set, straight and diagonal runs between them are scanned directly
+    :param grid: OccupancyGrid
+    :param start: Start position in world coordinates
+    :param goal: Goal position in world coordinates
+    :param stats: If a dict is given, its 'expanded' entry is set to the number of expanded jump points
+    :return: Path in world coordinates as an array with one point per row, from start to goal through every cell
+        (empty if the goal cannot be reached), as used by animate_path_bug1
+    """
+    setup = _search_setup(grid, start, goal)
+    if setup is None:
+        return np.zeros((0, 2))
+    occupied, row_length, idx_start, idx_goal = setup
+
+    def jump(idx, d_col, d_row):
+        """
+        Scan from idx, entered by the move (d_col, d_row), for the next jump point
+        :return: Flat index of the jump point, or -1 if the scan hits an obstacle
+        """
+        step = d_col + d_row * row_length
+        while True:
+            if occupied[idx]:
+                return -1
+            if idx == idx_goal:
+                return idx
+            if d_col and d_row:
+                # A diagonal cell is a jump point if a straight scan from it finds one
+                if jump(idx + d_col, d_col, 0) != -1 or jump(idx + d_row * row_length, 0, d_row) != -1:
+                    return idx
+                if occupied[idx + d_col] or occupied[idx + d_row * row_length]:
+                    return -1
+            elif d_col:
+                # Forced neighbours: a side cell opening up after an obstacle behind it
+                if (not occupied[idx + row_length] and occupied[idx + row_length - d_col]) or \
+                        (not occupied[idx - row_length] and occupied[idx - row_length - d_col]):
+                    return idx
+            else:
+                if (not occupied[idx + 1] and occupied[idx + 1 - d_row * row_length]) or \
+                        (not occupied[idx - 1] and occupied[idx - 1 - d_row * row_length]):
+                    return idx
+            idx += step
+
+    def directions(idx, parent):
+        """
+        :return: Moves (d_col, d_row) worth scanning from idx, given the jump point it was reached from
+        """
+        if parent == -1:
+            return [(d_col, d_row) for d_col in (-1, 0, 1) for d_row in (-1, 0, 1) if d_col or d_row]
+
+        p_row, p_col = divmod(parent, row_length)
+        row, col = divmod(idx, row_length)
+        d_col, d_row = (col > p_col) - (col < p_col), (row > p_row) - (row < p_row)
+        if d_col and d_row:
+            moves = [(d_col, 0), (0, d_row), (d_col, d_row)]
+        elif d_col:
+            moves = [(d_col, 0), (d_col, 1), (d_col, -1), (0, 1), (0, -1)]
+        else:
+            moves = [(0, d_row), (1, d_row), (-1, d_row), (1, 0), (-1, 0)]
+        return moves
+
+    n = len(occupied)
+    costs = array('d', [math.inf]) * n
+    parents = array('l', [-1]) * n
+    closed = bytearray(n)
+
+    costs[idx_start] = 0.0
+    heap = [(_octile_distance(idx_start, idx_goal, row_length), 0.0, idx_start)]
+    expanded = 0
+    found = False
+    while heap:
+        _, cost, idx = heapq.heappop(heap)
+        if closed[idx]:
+            continue
+        closed[idx] = 1
+        expanded += 1
+        if idx == idx_goal:
+            found = True
+            break
+
+        for d_col, d_row in directions(idx, parents[idx]):
+            # Diagonal moves need both shared neighbours free, as in grid_a_star
+            if d_col and d_row and (occupied[idx + d_col] or occupied[idx + d_row * row_length]):
+                continue
+            n_idx = jump(idx + d_col + d_row * row_length, d_col, d_row)
+            if n_idx == -1 or closed[n_idx]:
+                continue
+            n_cost = cost + _octile_distance(idx, n_idx, row_length)
+            if n_cost < costs[n_idx]:
+                costs[n_idx] = n_cost
+                parents[n_idx] = idx
+                heapq.heappush(heap, (n_cost + _octile_distance(n_idx, idx_goal, row_length), n_cost, n_idx))
+
+    if stats is not None:
+        stats['expanded'] = expanded
+    if not found:
+        return np.zeros((0, 2))
+
+    # Fill in the cells of the straight or diagonal runs between consecutive jump points
+    jump_points = _trace_cells(parents, idx_goal)
+    cells = [idx_start]
+    for a, b in zip(jump_points[:-1], jump_points[1:]):
+        (a_row, a_col), (b_row, b_col) = divmod(a, row_length), divmod(b, row_length)
+        step = ((b_col > a_col) - (b_col < a_col)) + ((b_row > a_row) - (b_row < a_row)) * row_length
+        cells.extend(range(a + step, b + step, step))
+    return _grid_path(grid, cells, row_length, start, goal)
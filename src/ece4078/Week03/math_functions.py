@@ -1,5 +1,16 @@
 import numpy as np
 import math
+import weakref
+from collections import OrderedDict
+from scipy.spatial import cKDTree
+
+# KD-trees of recently queried read-only point sets, see get_kd_tree
+KD_TREE_CACHE_SIZE = 8
+# Below this many points a linear scan is faster than building a tree
+MIN_POINTS_FOR_KD_TREE = 64
+# Segments are split into at most this many pieces when checked for collision
+MAX_PIECES_PER_SEGMENT = 256
+_kd_tree_cache = OrderedDict()
 
 def compute_distance_between_points(p1, p2):
     """ 
@@ -186,7 +197,154 @@ def point_in_line(line, point):
     return np.isclose(a*point[0] + b*point[1] - c, 0)
 
 
-def find_nearest(array, value):
+def is_read_only(points):
+    """
+    :param points: Array
+    :return: Whether the data of the array cannot be written, through it or through the arrays it is a view of
+    """
+    while isinstance(points, np.ndarray):
+        if points.flags.writeable:
+            return False
+        points = points.base
+    return True
+
+
+def get_kd_tree(points):
+    """
+    Get a KD-tree of a set of points. Trees of read-only arrays (e.g. PRM.vertices or memory-mapped vertices) are
+    cached, as their points cannot change; the tree of a writeable array is built on every call
+    :param points: Array with n rows (points) and 2 columns
+    :return: scipy.spatial.cKDTree of points
+    """
+    if not is_read_only(points):
+        return cKDTree(points)
+
+    key = id(points)
+    cached = _kd_tree_cache.get(key)
+    # The cache only holds weak references, an entry is dropped when its array is freed
+    if cached is not None and cached[0]() is points:
+        _kd_tree_cache.move_to_end(key)
+        return cached[1]
+
+    # Built on a copy, as the tree keeps a reference to its data which would keep the array alive
+    tree = cKDTree(np.array(points, dtype=float))
+    _kd_tree_cache[key] = (weakref.ref(points, lambda _, key=key: _kd_tree_cache.pop(key, None)), tree)
+    if len(_kd_tree_cache) > KD_TREE_CACHE_SIZE:
+        _kd_tree_cache.popitem(last=False)
+    return tree
+
+
+def find_k_nearest(array, values, k=1):
+    """
+    Find the k points of array closest to each query point
+    :param array: Array with n rows (points) and 2 columns
+    :param values: Query point, or array with m rows of query points
+    :param k: Number of neighbours
+    :return: (distances, indices) as returned by cKDTree.query, missing neighbours (k > n) have distance inf and
+             index n
+    """
+    if isinstance(array, np.ndarray) and len(array) >= MIN_POINTS_FOR_KD_TREE and is_read_only(array):
+        return get_kd_tree(array).query(values, k=k)
+
+    # Linear scan for small or writeable point sets, whose trees are not cached
     array = np.asarray(array)
-    idx = (np.linalg.norm(array - value, axis=1)).argmin()
-    return idx, array[idx]
\ No newline at end of file
+    values = np.asarray(values, dtype=float)
+    dist = np.linalg.norm(array[None, :, :] - np.atleast_2d(values)[:, None, :], axis=-1)
+    if k == 1 and len(array):
+        idx = np.argmin(dist, axis=1)[:, None]
+    elif k < len(array):
+        # Only the k closest points are sorted
+        idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        idx = np.take_along_axis(idx, np.argsort(np.take_along_axis(dist, idx, axis=1), axis=1, kind='stable'),
+                                 axis=1)
+    else:
+        idx = np.argsort(dist, axis=1, kind='stable')
+    dist = np.take_along_axis(dist, idx, axis=1)
+    if k > len(array):
+        missing = k - len(array)
+        dist = np.pad(dist, ((0, 0), (0, missing)), constant_values=np.inf)
+        idx = np.pad(idx, ((0, 0), (0, missing)), constant_values=len(array))
+    if k == 1:
+        dist, idx = dist[:, 0], idx[:, 0]
+    if values.ndim == 1:
+        dist, idx = dist[0], idx[0]
+    return dist, idx
+
+
+def find_nearest(array, value):
+    """
+    Find the point of array closest to value
+    :param array: Array with n rows (points) and 2 columns
+    :param value: Query point, or array with m rows of query points
+    :return: (index, point) of the closest point, or arrays of them for m query points
+    """
+    array = array if isinstance(array, np.ndarray) else np.asarray(array)
+    _, idx = find_k_nearest(array, value, k=1)
+    return idx, array[idx]
+
+def segments_in_collision(obstacle_tree, starts, ends, clearance, block_size=4096):
+    """
+    Check many segments against a set of obstacle points at once.
+    Each segment starts as a single piece. A piece whose nearest obstacle point is outside the ball around it is
+    free, and one whose midpoint is closer than clearance to an obstacle point is in collision. Other pieces are
+    halved until they are no longer than 4 * clearance (or 1 / MAX_PIECES_PER_SEGMENT of their segment), then
+    checked against every obstacle point in their ball
+    :param obstacle_tree: cKDTree of the obstacle points
+    :param starts: Array with one segment start per row
+    :param ends: Array with one segment end per row
+    :param clearance: Minimum distance between the segments and the obstacle points
+    :param block_size: Number of segment pieces checked per vectorized step, to bound memory use
+    :return: Boolean array, True for the segments with an obstacle point closer than clearance
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    min_lengths = np.maximum(4 * clearance, np.linalg.norm(ends - starts, axis=1) / MAX_PIECES_PER_SEGMENT)
+
+    in_collision = np.zeros(len(starts), dtype=bool)
+    for first in range(0, len(starts), block_size):
+        owners = np.arange(first, min(first + block_size, len(starts)))
+        # Pieces waiting to be checked as (owners, starts, ends), the newest first to keep the stack short
+        stack = [(owners, starts[owners], ends[owners])]
+        while stack:
+            owners, a, b = stack.pop()
+            if len(owners) > block_size:
+                stack.append((owners[block_size:], a[block_size:], b[block_size:]))
+                owners, a, b = owners[:block_size], a[:block_size], b[:block_size]
+            pending = ~in_collision[owners]
+            owners, a, b = owners[pending], a[pending], b[pending]
+            if len(owners) == 0:
+                continue
+
+            # Only the obstacle points in the ball around each piece can be closer than clearance
+            lengths = np.linalg.norm(b - a, axis=1)
+            radii = lengths / 2 + clearance
+            middles = (a + b) / 2
+            nearest, _ = obstacle_tree.query(middles, distance_upper_bound=radii.max())
+            in_collision[owners[nearest <= clearance]] = True
+            near = (nearest > clearance) & (nearest <= radii)
+
+            split = near & (lengths > min_lengths[owners])
+            if split.any():
+                stack.append((np.concatenate((owners[split], owners[split])),
+                              np.concatenate((a[split], middles[split])), np.concatenate((middles[split], b[split]))))
+
+            near = np.flatnonzero(near & ~split)
+            if len(near) == 0:
+                continue
+            a, b, radii = a[near], b[near], radii[near]
+            candidates = obstacle_tree.query_ball_point(middles[near], radii, return_sorted=False)
+            counts = np.fromiter((len(c) for c in candidates), dtype=np.int64, count=len(candidates))
+            if counts.sum() == 0:
+                continue
+            pieces = np.repeat(np.arange(len(a)), counts)
+            points = obstacle_tree.data[np.concatenate([c for c in candidates if len(c)]).astype(np.int64)]
+
+            # Distance from every candidate point to its piece
+            direction = (b - a)[pieces]
+            offset = points - a[pieces]
+            length_sq = np.einsum('ij,ij->i', direction, direction)
+            t = np.clip(np.einsum('ij,ij->i', offset, direction) / np.where(length_sq > 0, length_sq, 1), 0, 1)
+            distances = np.linalg.norm(offset - t[:, None] * direction, axis=1)
+
+            in_collision[owners[near[pieces[distances <= clearance]]]] = True
+    return in_collision
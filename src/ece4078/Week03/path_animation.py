@@ -34,9 +34,9 @@ def animate_path_bug1(initial_robot_pos,goal_pos,path,obstacles):
     else:
         # Animation code
         def init():
-            goal.set_data(g_x, g_y)
-            robot.set_data(s_x, s_y)
-            path_line.set_data(s_x, s_y)
+            goal.set_data([g_x], [g_y])
+            robot.set_data([s_x], [s_y])
+            path_line.set_data([s_x], [s_y])
             steps_text.set_text('')
             return robot, goal, path_line, steps_text
 
@@ -44,12 +44,12 @@ def animate_path_bug1(initial_robot_pos,goal_pos,path,obstacles):
             """perform animation step"""
             if i < path.shape[0]:
                 pos = path[i,:]
-                robot.set_data(pos[0], pos[1])
+                robot.set_data([pos[0]], [pos[1]])
                 path_line.set_data(path[:i, 0], path[:i, 1])
                 steps_text.set_text('Steps: %.1f' % i)
             return robot, path_line
 
-        ani = animation.FuncAnimation(fig, animate, frames=600, repeat=False, interval=10, init_func=init)
+        ani = animation.FuncAnimation(fig, animate, frames=len(path), repeat=False, interval=10, init_func=init)
         return ani
 
 
@@ -78,9 +78,9 @@ def animate_path_bug2(initial_robot_pos,goal_pos,path,obstacles):
     else:
         # Animation code
         def init():
-            goal.set_data(g_x, g_y)
-            robot.set_data(s_x, s_y)
-            path_line.set_data(s_x, s_y)
+            goal.set_data([g_x], [g_y])
+            robot.set_data([s_x], [s_y])
+            path_line.set_data([s_x], [s_y])
             steps_text.set_text('')
             line.set_data([s_x, g_x], [s_y, g_y])
             return robot, goal, path_line, steps_text
@@ -88,12 +88,12 @@ def animate_path_bug2(initial_robot_pos,goal_pos,path,obstacles):
         def animate(i):
             """perform animation step"""
             pos = path[i,:]
-            robot.set_data(pos[0], pos[1])
+            robot.set_data([pos[0]], [pos[1]])
             path_line.set_data(path[:i, 0], path[:i, 1])
             steps_text.set_text('Steps: %.1f' % i)
             return robot, path_line
 
-        ani = animation.FuncAnimation(fig, animate, frames=700, blit=True, interval=10, init_func=init)
+        ani = animation.FuncAnimation(fig, animate, frames=len(path), blit=True, interval=10, init_func=init)
         return ani
     
 def plot_circle(ax, x, y, size, color="-b"):  
@@ -129,13 +129,13 @@ def animate_path_rrt(rrt):
         start_pos = path_in_order[0,:]
 
         def init():
-            line_path.set_data(path_in_order[0], path_in_order[1])
-            return line_path
+            line_path.set_data(path_in_order[:1, 0], path_in_order[:1, 1])
+            return line_path,
 
         def animate(i):
             """perform animation step"""
             line_path.set_data(path_in_order[:i,0], path_in_order[:i, 1])
-            return line_path
+            return line_path,
 
         ani = animation.FuncAnimation(fig, animate, frames=30, blit=True, interval=100, init_func=init)
         return ani
@@ -174,8 +174,8 @@ def animate_path_rrtc(rrtc):
         start_pos = path[0,:]
         
         def init():
-            line_path.set_data(start_pos[0], start_pos[1])
-            return line_path
+            line_path.set_data([start_pos[0]], [start_pos[1]])
+            return line_path,
 
         def animate(i):
             """perform animation step"""
@@ -218,16 +218,15 @@ def animate_path_prm(rmap,start, goal, num_samples, robot_size, max_distance, ma
         start_pos = path_in_order[0,:]
 
         def init():
-            print(init)
-            start_plot.set_data(start[0], start[1])
-            goal_plot.set_data(goal[0], goal[1])
+            start_plot.set_data([start[0]], [start[1]])
+            goal_plot.set_data([goal[0]], [goal[1]])
             line_path.set_data([], [])
             return line_path, start_plot, goal_plot
 
         def animate(i):
             """perform animation step"""
             line_path.set_data(path_in_order[:i,0], path_in_order[:i, 1])
-            return line_path
+            return line_path,
 
         ani = animation.FuncAnimation(fig, animate, frames=30, blit=True, interval=30, init_func=init)
         return ani
@@ -1,9 +1,17 @@
 import os
 import random
 import math
+import time
+import heapq
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.spatial import cKDTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from .math_functions import find_nearest
 
 # Import dependencies and set random seed
 seed_value = 5
@@ -15,15 +23,10 @@ random.seed(seed_value)
 np.random.seed(seed_value)
 
 
-def find_nearest(array, value):
-	array = np.asarray(array)
-	idx = (np.linalg.norm(array - value, axis=1)).argmin()
-	return idx, array[idx]
-
-
 class Node:
 	"""
-	Node class for path search
+	Node class for path search. Searches keep their state in arrays, Nodes are only built as a view of it
+	(see nodes_from_search)
 	"""
 
 	def __init__(self, point, cost=0, parent_index=0, roadmap_index=0):
@@ -35,50 +38,560 @@ class Node:
 	def __str__(self):
 		return str(self.x) + "," + str(self.y) + "," +\
 			   str(self.cost) + "," + str(self.parent_index)
-	
-def breadth_first_search(road_map, start, goal):
 
-			
-	idx_start, vertex_start = find_nearest(road_map.vertices, start)
+
+def nodes_from_search(road_map, parents, costs, visited):
+	"""
+	Node view of a search, for printing or teaching purposes
+	:param road_map: Roadmap with vertices
+	:param parents: Parent roadmap index of every vertex (-1 for the start vertex)
+	:param costs: Cost of reaching every vertex
+	:param visited: Whether every vertex was visited
+	:return: Dict of roadmap index: Node of every visited vertex
+	"""
+	return {idx: Node(road_map.vertices[idx, :], cost=costs[idx], parent_index=parents[idx], roadmap_index=idx)
+			for idx in range(len(visited)) if visited[idx]}
+
+
+def breadth_first_search(road_map, start, goal, visited_nodes=None, stats=None):
+	"""
+	Breadth-first search over a roadmap. The search state is kept in arrays indexed by roadmap index
+	:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+	:param start: Start position, snapped to its nearest vertex
+	:param goal: Goal position, snapped to its nearest vertex
+	:param visited_nodes: If a dict is given, it is filled with a Node for every visited vertex (see nodes_from_search)
+	:param stats: If a dict is given, its 'expanded' entry is set to the number of expanded vertices
+	:return: Path as a list of points: goal, goal vertex, ..., start vertex, start. False if the goal is not reached
+	"""
+	idx_start, _ = find_nearest(road_map.vertices, start)
 	idx_goal, vertex_goal = find_nearest(road_map.vertices, goal)
-			
-	start_node = Node(vertex_start, cost=0.0, parent_index=-1,roadmap_index=idx_start)
-	goal_node = Node(vertex_goal, cost=0.0, parent_index=-1, roadmap_index=idx_goal)
-	
-	queue = [start_node]
-	visited_nodes = {idx_start: start_node}
-	cur_idx = 0
-	
-	
-	def reconstruct_path():
-		path = [np.array([goal[0], goal[1]]), np.array([goal_node.x, goal_node.y])]
-		parent_index = goal_node.parent_index
-		while parent_index != -1:
-			n = visited_nodes[parent_index]
-			path.append(np.array([n.x, n.y]))
-			parent_index = n.parent_index
-		path.append(np.array([start[0], start[1]]))
-		return path
-		   
-	while queue:
-		node = queue.pop(0)
-		for idx in road_map.edges[node.idx_roadmap]:
-			if idx not in visited_nodes:
-				v = road_map.vertices[idx, :]
-				cost = node.cost + np.linalg.norm(np.array([node.x, node.y]) - v)
-				
-				# Create new node and mark it as visited
-				new_node = Node(v, cost=cost, parent_index=node.idx_roadmap, roadmap_index=idx)
-				visited_nodes[idx] = new_node
-				
-				# Add it to the queue
-				queue.append(new_node)
-				
-				# Verify if new visited node is goal 
-				if np.isclose(new_node.x, goal_node.x) and np.isclose(new_node.y, goal_node.y):
-					goal_node.idx_roadmap = idx
-					goal_node.parent_index = node.idx_roadmap
-					goal_node.cost = cost
-					return reconstruct_path()
-				
-	return False
\ No newline at end of file
+	idx_start = int(idx_start)
+
+	n = len(road_map.vertices)
+	# Compact 8 byte per vertex copies of the coordinates, with fast scalar access
+	xs = array('d', np.ascontiguousarray(road_map.vertices[:, 0], dtype=float).tobytes())
+	ys = array('d', np.ascontiguousarray(road_map.vertices[:, 1], dtype=float).tobytes())
+	# Vertices at the position of the goal vertex
+	goal_indices = set(np.flatnonzero(np.isclose(road_map.vertices[:, 0], vertex_goal[0]) &
+									  np.isclose(road_map.vertices[:, 1], vertex_goal[1])).tolist())
+
+	parents = array('l', [-1]) * n
+	costs = array('d', [0.0]) * n
+	visited = bytearray(n)
+	visited[idx_start] = 1
+
+	# FIFO queue as a list with a moving head, every vertex enters it at most once
+	queue = [idx_start]
+	head = 0
+	found = -1
+	while head < len(queue) and found == -1:
+		idx = queue[head]
+		head += 1
+		x, y, cost = xs[idx], ys[idx], costs[idx]
+		for n_idx in road_map.edges[idx]:
+			if visited[n_idx]:
+				continue
+			visited[n_idx] = 1
+			parents[n_idx] = idx
+			costs[n_idx] = cost + math.hypot(xs[n_idx] - x, ys[n_idx] - y)
+			queue.append(n_idx)
+
+			# Verify if new visited node is goal
+			if n_idx in goal_indices:
+				found = n_idx
+				break
+
+	if visited_nodes is not None:
+		visited_nodes.update(nodes_from_search(road_map, parents, costs, visited))
+	if stats is not None:
+		stats['expanded'] = head
+
+	if found == -1:
+		return False
+	return reconstruct_path(road_map, parents, found, start, goal)
+
+
+def reconstruct_path(road_map, parents, idx_goal, start, goal):
+	"""
+	Build a path in the same format as breadth_first_search: goal, goal vertex, ..., start vertex, start
+	:param road_map: Roadmap with vertices
+	:param parents: Parent roadmap index of every vertex (-1 for the start vertex)
+	:param idx_goal: Roadmap index of the goal vertex
+	:param start: Start position
+	:param goal: Goal position
+	:return: List of np.array points
+	"""
+	path = [np.array([goal[0], goal[1]])]
+	idx = idx_goal
+	while idx != -1:
+		path.append(np.array(road_map.vertices[idx, :]))
+		idx = parents[idx]
+	path.append(np.array([start[0], start[1]]))
+	return path
+
+
+def best_first_search(road_map, start, goal, use_heuristic=True, stats=None):
+	"""
+	Shortest path search over a roadmap using a binary heap, with Euclidean edge costs.
+	Dijkstra when use_heuristic is False, A* with the Euclidean distance to the goal as heuristic otherwise
+	:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+	:param start: Start position, snapped to its nearest vertex
+	:param goal: Goal position, snapped to its nearest vertex
+	:param use_heuristic: Whether to guide the search with the distance to the goal
+	:param stats: If a dict is given, its 'expanded' entry is set to the number of expanded vertices
+	:return: Path in the same format as breadth_first_search, or False if the goal cannot be reached
+	"""
+	idx_start, _ = find_nearest(road_map.vertices, start)
+	idx_goal, _ = find_nearest(road_map.vertices, goal)
+
+	# Plain Python lists are much faster than NumPy arrays for the scalar accesses of the search loop
+	xs = road_map.vertices[:, 0].tolist()
+	ys = road_map.vertices[:, 1].tolist()
+	goal_x, goal_y = xs[idx_goal], ys[idx_goal]
+	costs = [math.inf] * len(xs)
+	parents = [-1] * len(xs)
+	closed = bytearray(len(xs))
+
+	costs[idx_start] = 0.0
+	heap = [(0.0, 0.0, idx_start)]
+	expanded = 0
+
+	while heap:
+		_, cost, idx = heapq.heappop(heap)
+		if closed[idx]:
+			# Stale entry, the vertex was already reached through a cheaper path
+			continue
+		closed[idx] = 1
+		expanded += 1
+
+		if idx == idx_goal:
+			if stats is not None:
+				stats['expanded'] = expanded
+			return reconstruct_path(road_map, parents, idx_goal, start, goal)
+
+		x, y = xs[idx], ys[idx]
+		for n_idx in road_map.edges[idx]:
+			if closed[n_idx]:
+				continue
+			n_cost = cost + math.hypot(xs[n_idx] - x, ys[n_idx] - y)
+			if n_cost < costs[n_idx]:
+				costs[n_idx] = n_cost
+				parents[n_idx] = idx
+				priority = n_cost + math.hypot(goal_x - xs[n_idx], goal_y - ys[n_idx]) if use_heuristic else n_cost
+				heapq.heappush(heap, (priority, n_cost, n_idx))
+
+	if stats is not None:
+		stats['expanded'] = expanded
+	return False
+
+
+def dijkstra_search(road_map, start, goal, stats=None):
+	"""
+	Shortest path between start and goal over a roadmap (see best_first_search)
+	"""
+	return best_first_search(road_map, start, goal, use_heuristic=False, stats=stats)
+
+
+def a_star_search(road_map, start, goal, stats=None):
+	"""
+	Shortest path between start and goal over a roadmap, guided by the Euclidean distance to the goal
+	(see best_first_search)
+	"""
+	return best_first_search(road_map, start, goal, use_heuristic=True, stats=stats)
+
+
+def join_search_trees(road_map, parents_start, parents_goal, idx_start_tree, idx_goal_tree, start, goal):
+	"""
+	Build the path of a bidirectional search, in the same format as breadth_first_search
+	:param road_map: Roadmap with vertices
+	:param parents_start: Parent roadmap index of every vertex in the tree grown from the start (-1 at its root)
+	:param parents_goal: Parent roadmap index of every vertex in the tree grown from the goal (-1 at its root)
+	:param idx_start_tree: Roadmap index of the vertex of the start tree where the trees are joined
+	:param idx_goal_tree: Roadmap index of the vertex of the goal tree where the trees are joined (an edge away
+		from idx_start_tree, or the same vertex)
+	:param start: Start position
+	:param goal: Goal position
+	:return: List of np.array points
+	"""
+	towards_start = [idx_start_tree]
+	while parents_start[towards_start[-1]] != -1:
+		towards_start.append(parents_start[towards_start[-1]])
+
+	towards_goal = [idx_goal_tree]
+	while parents_goal[towards_goal[-1]] != -1:
+		towards_goal.append(parents_goal[towards_goal[-1]])
+	if idx_goal_tree == idx_start_tree:
+		towards_goal.pop(0)
+
+	indices = towards_goal[::-1] + towards_start
+	return [np.array([goal[0], goal[1]])] + list(np.array(road_map.vertices[indices, :])) + \
+		[np.array([start[0], start[1]])]
+
+
+def bidirectional_breadth_first_search(road_map, start, goal, stats=None):
+	"""
+	Breadth-first search grown from both the start and the goal vertex, one level of the smaller frontier at a time,
+	until the two trees meet. Edges are assumed to go both ways, as in PRM roadmaps
+	:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+	:param start: Start position, snapped to its nearest vertex
+	:param goal: Goal position, snapped to its nearest vertex
+	:param stats: If a dict is given, its 'expanded' entry is set to the number of expanded vertices
+	:return: Path in the same format as breadth_first_search, or False if the goal cannot be reached
+	"""
+	idx_start, _ = find_nearest(road_map.vertices, start)
+	idx_goal, _ = find_nearest(road_map.vertices, goal)
+	idx_start, idx_goal = int(idx_start), int(idx_goal)
+
+	n = len(road_map.vertices)
+	# One parent array and frontier per tree (0: grown from the start, 1: from the goal),
+	# and the tree that reached every vertex (1 or 2, 0 if none)
+	parents = (array('l', [-1]) * n, array('l', [-1]) * n)
+	frontiers = [[idx_start], [idx_goal]]
+	reached_by = bytearray(n)
+	reached_by[idx_start] = 1
+	reached_by[idx_goal] = 2
+	expanded = 0
+
+	# Vertices of the start tree and of the goal tree joined by an edge
+	joint = (idx_start, idx_goal) if idx_start == idx_goal else None
+	while joint is None and frontiers[0] and frontiers[1]:
+		side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+		tree, other_tree = side + 1, 2 - side
+		side_parents = parents[side]
+		next_frontier = []
+		for idx in frontiers[side]:
+			expanded += 1
+			for n_idx in road_map.edges[idx]:
+				if reached_by[n_idx] == other_tree:
+					joint = (idx, n_idx) if side == 0 else (n_idx, idx)
+					break
+				if not reached_by[n_idx]:
+					reached_by[n_idx] = tree
+					side_parents[n_idx] = idx
+					next_frontier.append(n_idx)
+			if joint is not None:
+				break
+		frontiers[side] = next_frontier
+
+	if stats is not None:
+		stats['expanded'] = expanded
+	if joint is None:
+		return False
+	return join_search_trees(road_map, parents[0], parents[1], joint[0], joint[1], start, goal)
+
+
+def bidirectional_dijkstra_search(road_map, start, goal, stats=None):
+	"""
+	Dijkstra's search grown from both the start and the goal vertex, expanding the side with the cheapest frontier,
+	until no path through the unexpanded vertices can beat the best connection found.
+	Edges are assumed to go both ways, as in PRM roadmaps
+	:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+	:param start: Start position, snapped to its nearest vertex
+	:param goal: Goal position, snapped to its nearest vertex
+	:param stats: If a dict is given, its 'expanded' entry is set to the number of expanded vertices
+	:return: Path in the same format as breadth_first_search (a shortest one), or False if the goal cannot be reached
+	"""
+	idx_start, _ = find_nearest(road_map.vertices, start)
+	idx_goal, _ = find_nearest(road_map.vertices, goal)
+	idx_start, idx_goal = int(idx_start), int(idx_goal)
+
+	xs = road_map.vertices[:, 0].tolist()
+	ys = road_map.vertices[:, 1].tolist()
+	n = len(xs)
+	# One set of arrays and heap per side (0: from the start, 1: from the goal)
+	costs = ([math.inf] * n, [math.inf] * n)
+	parents = ([-1] * n, [-1] * n)
+	closed = (bytearray(n), bytearray(n))
+	costs[0][idx_start] = 0.0
+	costs[1][idx_goal] = 0.0
+	heaps = ([(0.0, idx_start)], [(0.0, idx_goal)])
+	expanded = 0
+
+	# Cost of the best connection found so far, and its vertices in the start and goal trees
+	best_cost = 0.0 if idx_start == idx_goal else math.inf
+	joint = (idx_start, idx_goal)
+
+	while heaps[0] and heaps[1] and heaps[0][0][0] + heaps[1][0][0] < best_cost:
+		side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+		cost, idx = heapq.heappop(heaps[side])
+		side_closed = closed[side]
+		if side_closed[idx]:
+			# Stale entry, the vertex was already reached through a cheaper path
+			continue
+		side_closed[idx] = 1
+		expanded += 1
+
+		side_costs, side_parents, other_costs = costs[side], parents[side], costs[1 - side]
+		x, y = xs[idx], ys[idx]
+		for n_idx in road_map.edges[idx]:
+			n_cost = cost + math.hypot(xs[n_idx] - x, ys[n_idx] - y)
+			if n_cost + other_costs[n_idx] < best_cost:
+				best_cost = n_cost + other_costs[n_idx]
+				joint = (idx, n_idx) if side == 0 else (n_idx, idx)
+			if not side_closed[n_idx] and n_cost < side_costs[n_idx]:
+				side_costs[n_idx] = n_cost
+				side_parents[n_idx] = idx
+				heapq.heappush(heaps[side], (n_cost, n_idx))
+
+	if stats is not None:
+		stats['expanded'] = expanded
+	if math.isinf(best_cost):
+		return False
+	return join_search_trees(road_map, parents[0], parents[1], joint[0], joint[1], start, goal)
+
+
+def roadmap_graph(road_map):
+	"""
+	Sparse adjacency matrix of a roadmap, weighted by the Euclidean length of every edge
+	:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+	:return: scipy.sparse.csr_matrix with dimensions n x n
+	"""
+	n = len(road_map.vertices)
+	degrees = np.fromiter((len(neighbours) for neighbours in road_map.edges), dtype=np.int64, count=n)
+	indptr = np.concatenate(([0], np.cumsum(degrees)))
+	indices = np.fromiter((idx for neighbours in road_map.edges for idx in neighbours), dtype=np.int64,
+						  count=indptr[-1])
+	rows = np.repeat(np.arange(n), degrees)
+	weights = np.linalg.norm(road_map.vertices[indices] - road_map.vertices[rows], axis=1)
+	return csr_matrix((weights, indices, indptr), shape=(n, n))
+
+
+class ShortestPathCache:
+	"""
+	Query layer for planning many times over a fixed roadmap.
+
+	Each query snaps its start and goal to their nearest vertices and needs the shortest-path tree of one of them.
+	Trees are computed with scipy's Dijkstra and kept in an LRU cache bounded by max_bytes, so queries sharing a
+	start (or, on undirected roadmaps, a goal) vertex only cost the path extraction. Small roadmaps can instead
+	precompute the trees of all vertices at once (all_pairs=True).
+
+	The roadmap must not be modified while the cache is in use (call clear() after changing it)
+	"""
+
+	# Largest roadmap for which all_pairs is allowed (the tables take 12 * n^2 bytes)
+	ALL_PAIRS_MAX_VERTICES = 2000
+
+	def __init__(self, road_map, max_bytes=64 * 2 ** 20, all_pairs=False):
+		"""
+		:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+		:param max_bytes: Memory cap of the cached shortest-path trees
+		:param all_pairs: Whether to precompute the shortest paths between all pairs of vertices
+		"""
+		self.road_map = road_map
+		self.max_bytes = max_bytes
+		self.all_pairs = all_pairs
+		self.hits = 0
+		self.misses = 0
+		self.clear()
+
+	def clear(self):
+		"""
+		Drop every cached tree and rebuild the graph of the roadmap
+		"""
+		self.graph = roadmap_graph(self.road_map)
+		# Trees can be reused in reverse if every edge goes both ways
+		self.undirected = (self.graph != self.graph.T).nnz == 0
+		self.trees = OrderedDict()
+		self.nbytes = 0
+		self.distances = self.predecessors = None
+
+		if self.all_pairs:
+			n = self.graph.shape[0]
+			if n > self.ALL_PAIRS_MAX_VERTICES:
+				raise ValueError('all_pairs is limited to roadmaps of at most %d vertices, this one has %d'
+								 % (self.ALL_PAIRS_MAX_VERTICES, n))
+			distances, predecessors = dijkstra(self.graph, return_predecessors=True)
+			self.distances, self.predecessors = distances, predecessors.astype(np.int32)
+
+	def shortest_path_tree(self, idx_source):
+		"""
+		:param idx_source: Roadmap index of the source vertex
+		:return: tuple (distances, predecessors) from the source to every vertex (predecessors are negative for the
+			source and for unreachable vertices)
+		"""
+		if self.distances is not None:
+			self.hits += 1
+			return self.distances[idx_source], self.predecessors[idx_source]
+
+		tree = self.trees.get(idx_source)
+		if tree is not None:
+			self.hits += 1
+			self.trees.move_to_end(idx_source)
+			return tree
+
+		self.misses += 1
+		distances, predecessors = dijkstra(self.graph, indices=idx_source, return_predecessors=True)
+		tree = distances, predecessors.astype(np.int32)
+		self.trees[idx_source] = tree
+		self.nbytes += tree[0].nbytes + tree[1].nbytes
+
+		# Evict the least recently used trees, always keeping the one just computed
+		while self.nbytes > self.max_bytes and len(self.trees) > 1:
+			_, (old_distances, old_predecessors) = self.trees.popitem(last=False)
+			self.nbytes -= old_distances.nbytes + old_predecessors.nbytes
+		return tree
+
+	def __vertex_path__(self, idx_start, idx_goal):
+		"""
+		:return: Roadmap indices from the goal vertex to the start vertex and the cost between them, or (None, inf)
+		"""
+		# Prefer a tree already available, rooted at the start or, if edges are symmetric, at the goal
+		reverse = self.undirected and self.distances is None and idx_start not in self.trees \
+			and idx_goal in self.trees
+		idx_source, idx_target = (idx_goal, idx_start) if reverse else (idx_start, idx_goal)
+
+		distances, predecessors = self.shortest_path_tree(idx_source)
+		cost = float(distances[idx_target])
+		if np.isinf(cost):
+			return None, cost
+
+		indices = [idx_target]
+		while indices[-1] != idx_source:
+			indices.append(int(predecessors[indices[-1]]))
+		return (indices[::-1] if reverse else indices), cost
+
+	def cost(self, start, goal):
+		"""
+		:param start: Start position, snapped to its nearest vertex
+		:param goal: Goal position, snapped to its nearest vertex
+		:return: Length of the shortest roadmap path between the two vertices (inf if unreachable)
+		"""
+		idx_start, _ = find_nearest(self.road_map.vertices, start)
+		idx_goal, _ = find_nearest(self.road_map.vertices, goal)
+		return self.__vertex_path__(int(idx_start), int(idx_goal))[1]
+
+	def plan(self, start, goal):
+		"""
+		Shortest path between start and goal over the roadmap
+		:param start: Start position, snapped to its nearest vertex
+		:param goal: Goal position, snapped to its nearest vertex
+		:return: Path in the same format as breadth_first_search, or False if the goal cannot be reached
+		"""
+		idx_start, _ = find_nearest(self.road_map.vertices, start)
+		idx_goal, _ = find_nearest(self.road_map.vertices, goal)
+		indices, _ = self.__vertex_path__(int(idx_start), int(idx_goal))
+		if indices is None:
+			return False
+
+		return [np.array([goal[0], goal[1]])] + list(np.array(self.road_map.vertices[indices, :])) + \
+			[np.array([start[0], start[1]])]
+
+
+SEARCH_METHODS = {'breadth_first': breadth_first_search, 'dijkstra': dijkstra_search, 'a_star': a_star_search,
+				  'bidirectional_breadth_first': bidirectional_breadth_first_search,
+				  'bidirectional_dijkstra': bidirectional_dijkstra_search}
+
+
+class ArrayRoadmap:
+	"""
+	Roadmap with the vertices and edges of another one, rebuilt from its CSR arrays (see roadmap_graph)
+	"""
+
+	def __init__(self, vertices, indptr, indices):
+		self.vertices = vertices
+		# Neighbour lists as plain Python lists, which the search loops index fastest
+		indices = indices.tolist()
+		self.edges = [indices[begin:end] for begin, end in zip(indptr[:-1].tolist(), indptr[1:].tolist())]
+
+
+# Roadmap of a plan_batch worker process, attached to shared memory by _attach_roadmap
+_worker_road_map = None
+_worker_blocks = []
+
+
+def _attach_roadmap(arrays):
+	"""
+	Initializer of the plan_batch worker processes
+	:param arrays: Dict of name: (shared memory block name, shape, dtype) of vertices, indptr and indices
+	"""
+	global _worker_road_map
+	views = {}
+	for name, (block_name, shape, dtype) in arrays.items():
+		block = shared_memory.SharedMemory(name=block_name)
+		_worker_blocks.append(block)
+		views[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+		# Read-only, so that the searches reuse the cached KD-tree of the vertices
+		views[name].setflags(write=False)
+	_worker_road_map = ArrayRoadmap(views['vertices'], views['indptr'], views['indices'])
+
+
+def _plan_chunk(starts, goals, method, road_map=None):
+	"""
+	Run a share of the queries of plan_batch
+	:param starts: Array with one start position per row
+	:param goals: Array with one goal position per row
+	:param method: Key of SEARCH_METHODS
+	:param road_map: Roadmap to search, the one attached to this worker process if not given
+	:return: List of (path as a k x 2 array or None, cost, time in seconds) for every query
+	"""
+	road_map = _worker_road_map if road_map is None else road_map
+	search = SEARCH_METHODS[method]
+	results = []
+	for start, goal in zip(starts, goals):
+		t_start = time.perf_counter()
+		path = search(road_map, start, goal)
+		elapsed = time.perf_counter() - t_start
+
+		if path is False:
+			results.append((None, math.inf, elapsed))
+		else:
+			path = np.array(path)
+			# Length of the roadmap part of the path, from the goal vertex to the start vertex
+			cost = float(np.sum(np.linalg.norm(np.diff(path[1:-1], axis=0), axis=1)))
+			results.append((path, cost, elapsed))
+	return results
+
+
+def plan_batch(road_map, starts, goals, method='a_star', num_workers=None, chunks_per_worker=4):
+	"""
+	Plan many queries over the same roadmap across a pool of processes.
+	The roadmap is copied once into shared memory, which every worker maps, and each task only carries its own
+	starts and goals
+	:param road_map: Roadmap with vertices (n x 2 array) and edges (neighbour indices of every vertex)
+	:param starts: Array with one start position per row
+	:param goals: Array with one goal position per row
+	:param method: Key of SEARCH_METHODS ('a_star', 'dijkstra', 'breadth_first' or their bidirectional variants)
+	:param num_workers: Number of processes, the number of CPUs by default (1 runs everything in this process)
+	:param chunks_per_worker: Number of tasks per worker, more tasks balance uneven queries better
+	:return: tuple (paths, costs, times)
+
+		paths (list): path of every query in the breadth_first_search format, or False if the goal cannot be reached
+		costs (array): length of the roadmap part of every path (inf if the goal cannot be reached)
+		times (array): search time of every query in seconds, measured in the process that ran it
+	"""
+	assert method in SEARCH_METHODS
+	starts = np.atleast_2d(np.asarray(starts, dtype=float))
+	goals = np.atleast_2d(np.asarray(goals, dtype=float))
+	assert starts.shape == goals.shape
+	num_workers = os.cpu_count() if num_workers is None else num_workers
+
+	if num_workers == 1:
+		results = _plan_chunk(starts, goals, method, road_map)
+	else:
+		graph = roadmap_graph(road_map)
+		arrays = {'vertices': np.ascontiguousarray(road_map.vertices, dtype=float),
+				  'indptr': graph.indptr, 'indices': graph.indices}
+		blocks = []
+		try:
+			shared = {}
+			for name, array in arrays.items():
+				block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+				blocks.append(block)
+				np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+				shared[name] = (block.name, array.shape, array.dtype.str)
+
+			chunks = np.array_split(np.arange(len(starts)), num_workers * chunks_per_worker)
+			with ProcessPoolExecutor(max_workers=num_workers, initializer=_attach_roadmap,
+									 initargs=(shared,)) as executor:
+				futures = [executor.submit(_plan_chunk, starts[chunk], goals[chunk], method)
+						   for chunk in chunks if len(chunk)]
+				results = [result for future in futures for result in future.result()]
+		finally:
+			for block in blocks:
+				block.close()
+				block.unlink()
+
+	paths = [False if path is None else list(path) for path, _, _ in results]
+	costs = np.array([cost for _, cost, _ in results])
+	times = np.array([elapsed for _, _, elapsed in results])
+	return paths, costs, times
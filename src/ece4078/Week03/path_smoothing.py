@@ -0,0 +1,230 @@
+import time
+import numpy as np
+from scipy.spatial import cKDTree
+from .math_functions import segments_in_collision
+
+# Shortcutting stops early after this many random rounds in a row without improvement
+MAX_IDLE_ROUNDS = 5
+
+
+def path_length(path):
+    """
+    :param path: List of points
+    :return: Length of the polyline through the points
+    """
+    points = np.asarray(path, dtype=float).reshape(-1, 2)
+    return float(np.sum(np.linalg.norm(np.diff(points, axis=0), axis=1)))
+
+
+def as_obstacle_tree(obstacles):
+    """
+    :param obstacles: cKDTree of obstacle points (e.g. PRM.obstacles) or array with one obstacle point per row
+    :return: cKDTree of the obstacle points
+    """
+    if isinstance(obstacles, cKDTree):
+        return obstacles
+    return cKDTree(np.asarray(obstacles, dtype=float).reshape(-1, 2))
+
+
+def _pairs_by_gap(k, block_size):
+    """
+    :param k: Number of path points
+    :param block_size: Maximum number of pairs per block
+    :return: Generator of blocks (i, j) of index pairs with j - i >= 2, ordered by gap j - i
+    """
+    block_i, block_j, size = [], [], 0
+    for gap in range(2, k):
+        first = 0
+        while first < k - gap:
+            i = np.arange(first, min(first + block_size - size, k - gap))
+            first += len(i)
+            block_i.append(i)
+            block_j.append(i + gap)
+            size += len(i)
+            if size == block_size:
+                yield np.concatenate(block_i), np.concatenate(block_j)
+                block_i, block_j, size = [], [], 0
+    if size:
+        yield np.concatenate(block_i), np.concatenate(block_j)
+
+
+def shortcut_vertices(points, obstacle_tree, clearance, deadline=None, block_size=256):
+    """
+    Shortest path through the points of a path that only skips points along collision-free segments.
+    Pairs of points are checked a block at a time, the closest pairs (along the path) first, until every pair is
+    checked or the deadline passes. The path is then found by dynamic programming over the collision-free pairs
+    :param points: Array with one path point per row
+    :param obstacle_tree: cKDTree of the obstacle points
+    :param clearance: Minimum distance between the path and the obstacle points
+    :param deadline: time.perf_counter() value after which no new block is checked, no limit by default
+    :param block_size: Number of pairs checked per block
+    :return: Array with the kept points
+    """
+    k = len(points)
+    if k < 3:
+        return points
+
+    # Pairs (i, j) grouped by gap j - i, consecutive points are always connected, as in the input path
+    visible_i, visible_j = [np.arange(k - 1)], [np.arange(1, k)]
+    for i, j in _pairs_by_gap(k, block_size):
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        free = ~segments_in_collision(obstacle_tree, points[i], points[j], clearance)
+        visible_i.append(i[free])
+        visible_j.append(j[free])
+
+    # Incoming pairs of each point, ordered by target point
+    visible_i, visible_j = np.concatenate(visible_i), np.concatenate(visible_j)
+    order = np.argsort(visible_j, kind='stable')
+    visible_i, visible_j = visible_i[order], visible_j[order]
+    distances = np.linalg.norm(points[visible_j] - points[visible_i], axis=1)
+    bounds = np.searchsorted(visible_j, np.arange(k + 1))
+
+    costs = np.full(k, np.inf)
+    parents = np.zeros(k, dtype=np.int64)
+    costs[0] = 0.0
+    for j in range(1, k):
+        sources = visible_i[bounds[j]:bounds[j + 1]]
+        candidates = costs[sources] + distances[bounds[j]:bounds[j + 1]]
+        best = np.argmin(candidates)
+        parents[j] = sources[best]
+        costs[j] = candidates[best]
+
+    kept = [k - 1]
+    while kept[-1] != 0:
+        kept.append(parents[kept[-1]])
+    return points[kept[::-1]]
+
+
+def shortcut_random(points, obstacle_tree, clearance, deadline, batch_size=256, min_gain=1e-6, rng=None):
+    """
+    Shortcut a path between random points along it (not only its vertices), until a deadline.
+    Each round samples batch_size candidate shortcuts, checks all of them in a single call and applies the
+    non-overlapping collision-free ones, largest gain first
+    :param points: Array with one path point per row
+    :param obstacle_tree: cKDTree of the obstacle points
+    :param clearance: Minimum distance between the path and the obstacle points
+    :param deadline: time.perf_counter() value after which no new round is started
+    :param batch_size: Number of candidate shortcuts per round
+    :param min_gain: Minimum length saved by a shortcut
+    :param rng: np.random.Generator
+    :return: Array with the points of the shortened path
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    idle_rounds = 0
+    while len(points) > 2 and idle_rounds < MAX_IDLE_ROUNDS and time.perf_counter() < deadline:
+        lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+        arc = np.concatenate(([0.0], np.cumsum(lengths)))
+
+        # Pairs of arc-length positions, and the segment and point at each of them
+        s = np.sort(rng.uniform(0.0, arc[-1], size=(batch_size, 2)), axis=1)
+        segments = np.clip(np.searchsorted(arc, s, side='right') - 1, 0, len(lengths) - 1)
+        t = (s - arc[segments]) / np.where(lengths[segments] > 0, lengths[segments], 1.0)
+        p = points[segments] + t[..., None] * (points[segments + 1] - points[segments])
+        gains = (s[:, 1] - s[:, 0]) - np.linalg.norm(p[:, 1] - p[:, 0], axis=1)
+
+        candidates = np.flatnonzero((gains > min_gain) & (segments[:, 0] != segments[:, 1]))
+        if len(candidates):
+            candidates = candidates[~segments_in_collision(obstacle_tree, p[candidates, 0], p[candidates, 1],
+                                                           clearance)]
+
+        # Greedily accept the largest shortcuts whose arc-length intervals do not overlap
+        accepted = []
+        for c in candidates[np.argsort(-gains[candidates])]:
+            if all(s[c, 1] <= s[a, 0] or s[c, 0] >= s[a, 1] for a in accepted):
+                accepted.append(c)
+        if not accepted:
+            idle_rounds += 1
+            continue
+        idle_rounds = 0
+
+        pieces = []
+        cursor = 0
+        for c in sorted(accepted, key=lambda a: s[a, 0]):
+            pieces.extend([points[cursor:segments[c, 0] + 1], p[c]])
+            cursor = segments[c, 1] + 1
+        pieces.append(points[cursor:])
+        points = np.concatenate(pieces)
+
+        # Drop repeated points left where a shortcut starts or ends on a vertex
+        keep = np.concatenate(([True], np.any(np.diff(points, axis=0) != 0, axis=1)))
+        points = points[keep]
+    return points
+
+
+def quadratic_bspline(control_points, samples_per_span=10):
+    """
+    Sample the uniform quadratic B-spline of a control polygon
+    :param control_points: Array with one control point per row
+    :param samples_per_span: Number of samples per span of the curve
+    :return: Array with the sampled points, ending at the last span's end point
+    """
+    t = np.arange(samples_per_span)[:, None, None] / samples_per_span
+    middle = control_points[1:-1]
+    span_start = (control_points[:-2] + middle) / 2
+    span_end = (middle + control_points[2:]) / 2
+    curve = (1 - t) ** 2 * span_start + 2 * t * (1 - t) * middle + t ** 2 * span_end
+    # Samples ordered span by span
+    curve = curve.transpose(1, 0, 2).reshape(-1, 2)
+    return np.vstack((curve, span_end[-1:]))
+
+
+def smooth_vertices(points, obstacle_tree, clearance, samples_per_span=10, deadline=None):
+    """
+    Smooth a path into a quadratic B-spline with the path points as control points.
+    Where the curve comes closer than clearance to an obstacle, the control points of the colliding spans are
+    doubled, which pulls the curve onto the path there, until the whole curve is collision-free
+    :param points: Array with one path point per row
+    :param obstacle_tree: cKDTree of the obstacle points
+    :param clearance: Minimum distance between the path and the obstacle points
+    :param samples_per_span: Number of samples per span of the curve
+    :param deadline: time.perf_counter() value after which no new curve is checked and the points are returned
+                     unsmoothed, no limit by default
+    :return: Array with the sampled points of the curve
+    """
+    if len(points) < 3:
+        return points
+
+    # Doubling the end points makes the curve start and end on them
+    multiplicity = np.ones(len(points), dtype=np.int64)
+    multiplicity[[0, -1]] = 2
+    while deadline is None or time.perf_counter() < deadline:
+        control_points = np.repeat(points, multiplicity, axis=0)
+        curve = quadratic_bspline(control_points, samples_per_span)
+        in_collision = segments_in_collision(obstacle_tree, curve[:-1], curve[1:], clearance)
+        if not in_collision.any():
+            return curve
+
+        # Each span is shaped by its middle control point
+        spans = np.unique(np.flatnonzero(in_collision) // samples_per_span)
+        owners = np.repeat(np.arange(len(points)), multiplicity)[np.minimum(spans + 1, len(control_points) - 1)]
+        if np.all(multiplicity[owners] == 2):
+            # Every control point is doubled and the curve is the path itself
+            return points
+        multiplicity[owners] = 2
+    return points
+
+
+def postprocess_path(path, obstacles, clearance, time_budget=0.05, smooth=False, samples_per_span=10, seed=None):
+    """
+    Shorten a path by shortcutting it, and optionally smooth it into a spline
+    :param path: Path as a list of points, e.g. from breadth_first_search
+    :param obstacles: cKDTree of obstacle points (e.g. PRM.obstacles) or array with one obstacle point per row
+    :param clearance: Minimum distance between the path and the obstacle points (e.g. the robot size)
+    :param time_budget: Time in seconds after which no new shortcuts are checked and smoothing gives up. When
+                        smoothing, random shortcutting stops halfway through the time left after vertex shortcutting
+    :param smooth: Whether to smooth the shortcut path into a quadratic B-spline
+    :param samples_per_span: Number of samples per span of the spline
+    :param seed: Seed of the random shortcuts
+    :return: Path as a list of np.array points, with the same end points as the input path
+    """
+    deadline = time.perf_counter() + time_budget
+    obstacle_tree = as_obstacle_tree(obstacles)
+    points = np.array(path, dtype=float).reshape(-1, 2)
+
+    points = shortcut_vertices(points, obstacle_tree, clearance, deadline)
+    shortcut_deadline = (time.perf_counter() + deadline) / 2 if smooth else deadline
+    points = shortcut_random(points, obstacle_tree, clearance, shortcut_deadline, rng=np.random.default_rng(seed))
+    if smooth:
+        points = smooth_vertices(points, obstacle_tree, clearance, samples_per_span, deadline)
+    return list(points)
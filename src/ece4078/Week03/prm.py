@@ -0,0 +1,199 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from .math_functions import segments_in_collision
+from .path_search import breadth_first_search
+from ..npz_storage import save_arrays, load_arrays
+
+# Version of the layout written by PRM.save
+ROADMAP_FORMAT_VERSION = 1
+# Arguments of PRM.__generate_roadmap__, saved with the roadmap, and their types
+BUILD_PARAMS = {'num_samples': int, 'max_distance': float, 'max_neighbours': int, 'robot_size': float}
+
+
+class NeighbourLists:
+    """
+    Sequence view of CSR edges: item i is the list of neighbours of vertex i
+    """
+
+    def __init__(self, indptr, indices):
+        # Plain ndarray views of memory-mapped arrays are much faster to slice than np.memmap
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, idx):
+        begin, end = self.indptr[idx:idx + 2].tolist()
+        return self.indices[begin:end].tolist()
+
+    def __iter__(self):
+        return (self[idx] for idx in range(len(self)))
+
+
+class PRM:
+    """
+    Probabilistic roadmap over a set of obstacle points
+
+    This class has the following attributes
+
+    - obstacles: cKDTree of the obstacle points (obstacles.data holds the points)
+    - sample_area: ((x_min, x_max), (y_min, y_max)) in which vertices are sampled
+    - vertices: Read-only array with n rows (vertices) and 2 columns, so that searches reuse its cached KD-tree
+    - edge_indptr, edge_indices: Edges in CSR form, the neighbours of vertex i are
+      edge_indices[edge_indptr[i]:edge_indptr[i + 1]]
+    - edges: Neighbour list of every vertex, as used by breadth_first_search (a NeighbourLists view of the CSR arrays)
+    - build_params: Arguments of the last __generate_roadmap__ call, None before the roadmap is built
+    - loaded: Whether the roadmap was loaded from a file (see load) and has not been rebuilt since
+
+    """
+
+    # Number of candidate edges checked for collision at once
+    EDGE_BLOCK_SIZE = 4096
+
+    def __init__(self, obstacle_points, sample_area=None, seed=None):
+        """
+        :param obstacle_points: Array with m rows (points on the obstacles) and 2 columns
+        :param sample_area: ((x_min, x_max), (y_min, y_max)), the bounding box of the obstacles by default
+        :param seed: Seed of the sampling generator
+        """
+        obstacle_points = np.asarray(obstacle_points, dtype=float).reshape(-1, 2)
+        self.obstacles = cKDTree(obstacle_points)
+        if sample_area is None:
+            sample_area = tuple(zip(obstacle_points.min(axis=0), obstacle_points.max(axis=0)))
+        self.sample_area = sample_area
+        self.rng = np.random.default_rng(seed)
+
+        self.vertices = np.zeros((0, 2))
+        self.edge_indptr = np.zeros(1, dtype=np.int64)
+        self.edge_indices = np.zeros(0, dtype=np.int64)
+        self.edges = NeighbourLists(self.edge_indptr, self.edge_indices)
+        self.build_params = None
+        self.loaded = False
+
+    @classmethod
+    def from_obstacles(cls, obstacles, **kwargs):
+        """
+        :param obstacles: List of Polygon (or Rectangle) obstacles, sampled along their outline
+        :param kwargs: Other arguments of PRM
+        :return: PRM
+        """
+        points = [np.column_stack(obs.plot_obstacle()) for obs in obstacles]
+        return cls(np.concatenate(points), **kwargs)
+
+    def __sample_points__(self, num_samples, robot_size, max_batches=100):
+        """
+        Sample collision-free points uniformly in the sample area, a batch at a time
+        :param num_samples: Number of points to return
+        :param robot_size: Minimum distance of the points to every obstacle point
+        :param max_batches: Number of batches drawn before giving up
+        :return: Array with at most num_samples rows and 2 columns
+        """
+        (x_min, x_max), (y_min, y_max) = self.sample_area
+        low, high = np.array([x_min, y_min]), np.array([x_max, y_max])
+
+        batches = []
+        found = 0
+        for _ in range(max_batches):
+            # Draw extra points to make up for the ones in collision
+            points = self.rng.uniform(low, high, size=(max(2 * (num_samples - found), 16), 2))
+            distances, _ = self.obstacles.query(points, distance_upper_bound=robot_size)
+            points = points[distances > robot_size][:num_samples - found]
+            batches.append(points)
+            found += len(points)
+            if found == num_samples:
+                break
+        return np.concatenate(batches)
+
+    def __generate_roadmap__(self, num_samples, max_distance, max_neighbours, robot_size):
+        """
+        Sample the vertices and connect each one to its nearest neighbours through collision-free edges
+        :param num_samples: Number of vertices
+        :param max_distance: Maximum length of an edge
+        :param max_neighbours: Number of nearest vertices each vertex tries to connect to
+        :param robot_size: Clearance kept from the obstacle points by vertices and edges
+        """
+        build_params = {'num_samples': num_samples, 'max_distance': max_distance, 'max_neighbours': max_neighbours,
+                        'robot_size': robot_size}
+        if self.loaded and build_params == self.build_params:
+            # Keep a loaded roadmap built with these parameters, a live one is resampled on every call
+            return
+
+        self.vertices = self.__sample_points__(num_samples, robot_size)
+        self.vertices.setflags(write=False)
+        n = len(self.vertices)
+
+        # Nearest neighbours of all vertices at once, missing neighbours are reported with index n
+        _, neighbours = cKDTree(self.vertices).query(self.vertices, k=max_neighbours + 1,
+                                                     distance_upper_bound=max_distance)
+        neighbours = neighbours.reshape(n, -1)
+        rows = np.repeat(np.arange(n), neighbours.shape[1])
+        cols = neighbours.ravel()
+        valid = (cols < n) & (cols != rows)
+
+        # Every undirected edge is checked once
+        pairs = np.unique(np.sort(np.column_stack((rows[valid], cols[valid])), axis=1), axis=0)
+        free = ~segments_in_collision(self.obstacles, self.vertices[pairs[:, 0]], self.vertices[pairs[:, 1]],
+                                      robot_size, block_size=self.EDGE_BLOCK_SIZE)
+        pairs = pairs[free]
+
+        # Store both directions in CSR form, sorted by source vertex
+        sources = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        targets = np.concatenate((pairs[:, 1], pairs[:, 0]))
+        order = np.lexsort((targets, sources))
+        self.edge_indices = targets[order]
+        self.edge_indptr = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=n))))
+
+        self.edges = NeighbourLists(self.edge_indptr, self.edge_indices)
+        self.build_params = build_params
+        self.loaded = False
+
+    def plan(self, start, goal, search=breadth_first_search):
+        """
+        Search the roadmap for a path between start and goal
+        :param start: Start position
+        :param goal: Goal position
+        :param search: Search function of path_search taking (road_map, start, goal)
+        :return: Path in the same format as breadth_first_search, or None if the goal cannot be reached
+        """
+        path = search(self, start, goal)
+        return None if path is False else path
+
+    def save(self, path):
+        """
+        Save the roadmap, its obstacle points and build parameters to an uncompressed .npz file
+        :param path: Destination file
+        """
+        params = self.build_params or {}
+        save_arrays(path, format_version=np.array(ROADMAP_FORMAT_VERSION),
+                    vertices=self.vertices, edge_indptr=self.edge_indptr, edge_indices=self.edge_indices,
+                    obstacle_points=self.obstacles.data, sample_area=np.array(self.sample_area, dtype=float),
+                    build_params=np.array([params.get(name, np.nan) for name in BUILD_PARAMS], dtype=float))
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a roadmap saved by save. Vertices and edges are memory-mapped, so loading is almost instantaneous.
+        Calling __generate_roadmap__ (e.g. from animate_path_prm) with the saved build parameters keeps the
+        loaded roadmap
+        :param path: .npz file written by save
+        :param mmap_mode: Mode passed to np.memmap, or None to read everything into memory
+        :return: PRM
+        """
+        arrays = load_arrays(path, mmap_mode=mmap_mode)
+        if int(arrays['format_version']) != ROADMAP_FORMAT_VERSION:
+            raise ValueError('Unsupported roadmap format version %d' % int(arrays['format_version']))
+
+        sample_area = tuple(tuple(bounds) for bounds in np.asarray(arrays['sample_area']).tolist())
+        road_map = cls(arrays['obstacle_points'], sample_area=sample_area)
+        road_map.vertices = arrays['vertices']
+        road_map.vertices.setflags(write=False)
+        road_map.edge_indptr = arrays['edge_indptr']
+        road_map.edge_indices = arrays['edge_indices']
+        road_map.edges = NeighbourLists(road_map.edge_indptr, road_map.edge_indices)
+
+        params = np.asarray(arrays['build_params']).tolist()
+        if not np.isnan(params).any():
+            road_map.build_params = {name: cast(value) for (name, cast), value in zip(BUILD_PARAMS.items(), params)}
+        road_map.loaded = True
+        return road_map
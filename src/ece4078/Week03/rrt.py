@@ -0,0 +1,362 @@
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class Node:
+    """
+    View of one tree node, in the format used by animate_path_rrt and animate_path_rrtc
+    """
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.path_x = []
+        self.path_y = []
+        self.parent = None
+
+
+class CircleSet:
+    """
+    Circle obstacles stored as arrays, so a segment is checked against all of them at once.
+
+    If a cell size is given, segments no longer than it are only checked against the circles near the grid cell
+    of their start, which are found once per cell and cached
+    """
+
+    def __init__(self, obstacle_list, cell_size=None):
+        """
+        :param obstacle_list: List of Circle obstacles
+        :param cell_size: Side of the grid cells, at least the length of the segments to check
+        """
+        centers = np.array([obs.center for obs in obstacle_list], dtype=float).reshape(-1, 2)
+        self.xs, self.ys = centers[:, 0].copy(), centers[:, 1].copy()
+        self.radii = np.array([obs.radius for obs in obstacle_list], dtype=float)
+        self.radii_sq = self.radii ** 2
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def __cell_circles__(self, cell):
+        """
+        :param cell: (column, row) of a grid cell
+        :return: List of (x, y, squared radius) of the circles a segment starting in the cell could touch
+        """
+        col, row = cell
+        # Such segments stay within the cell and its 8 neighbours
+        x_min, x_max = (col - 1) * self.cell_size, (col + 2) * self.cell_size
+        y_min, y_max = (row - 1) * self.cell_size, (row + 2) * self.cell_size
+        near = (self.xs + self.radii >= x_min) & (self.xs - self.radii <= x_max) & \
+               (self.ys + self.radii >= y_min) & (self.ys - self.radii <= y_max)
+        return list(zip(self.xs[near].tolist(), self.ys[near].tolist(), self.radii_sq[near].tolist()))
+
+    def is_segment_free(self, start, end):
+        """
+        :param start: Start point of the segment
+        :param end: End point of the segment
+        :return: Whether the segment stays outside every circle
+        """
+        x0, y0 = float(start[0]), float(start[1])
+        dx, dy = float(end[0]) - x0, float(end[1]) - y0
+        length_sq = dx * dx + dy * dy
+
+        if self.cell_size is not None and length_sq <= self.cell_size * self.cell_size:
+            cell = (math.floor(x0 / self.cell_size), math.floor(y0 / self.cell_size))
+            circles = self.cells.get(cell)
+            if circles is None:
+                circles = self.cells[cell] = self.__cell_circles__(cell)
+            # Few circles, checked one by one
+            for cx, cy, radius_sq in circles:
+                t = ((cx - x0) * dx + (cy - y0) * dy) / length_sq if length_sq > 0 else 0.0
+                t = min(max(t, 0.0), 1.0)
+                px, py = cx - x0 - t * dx, cy - y0 - t * dy
+                if px * px + py * py <= radius_sq:
+                    return False
+            return True
+
+        if len(self.radii_sq) == 0:
+            return True
+        # Closest point of the segment to every center, as a fraction t of the segment
+        offset_x, offset_y = self.xs - x0, self.ys - y0
+        t = offset_x * dx + offset_y * dy
+        if length_sq > 0:
+            t /= length_sq
+        np.clip(t, 0.0, 1.0, out=t)
+        offset_x -= t * dx
+        offset_y -= t * dy
+        return not (offset_x * offset_x + offset_y * offset_y <= self.radii_sq).any()
+
+
+class SearchTree:
+    """
+    Tree of points kept in growable arrays, with an incremental nearest-neighbour index.
+
+    The index is a KD-tree over the first points plus a tail of recent points searched by brute force, and the
+    KD-tree is rebuilt whenever the tail reaches MAX_TAIL points
+    """
+
+    # The KD-tree is rebuilt when the tail reaches this many points
+    MAX_TAIL = 1024
+
+    def __init__(self, root, capacity=1024):
+        """
+        :param root: Position of the root
+        :param capacity: Initial number of points the arrays can hold
+        """
+        self.points = np.zeros((capacity, 2))
+        self.parents = np.zeros(capacity, dtype=np.int64)
+        self.points[0] = root
+        self.parents[0] = -1
+        self.size = 1
+        self.kd_tree = None
+        self.indexed = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, point, parent):
+        """
+        :param point: Position of the new point
+        :param parent: Index of its parent
+        :return: Index of the new point
+        """
+        if self.size == len(self.points):
+            self.points = np.concatenate((self.points, np.zeros_like(self.points)))
+            self.parents = np.concatenate((self.parents, np.zeros_like(self.parents)))
+        self.points[self.size] = point
+        self.parents[self.size] = parent
+        self.size += 1
+
+        if self.size - self.indexed >= self.MAX_TAIL:
+            # Unbalanced trees build about twice as fast and query as fast on these points
+            self.kd_tree = cKDTree(self.points[:self.size], balanced_tree=False, compact_nodes=False)
+            self.indexed = self.size
+        return self.size - 1
+
+    def index_hints(self, points):
+        """
+        Query the KD-tree for a batch of points at once, which is much cheaper than one query per point
+        :param points: Array with one query position per row
+        :return: List of hints for nearest, one per point
+        """
+        if self.kd_tree is None:
+            return [(math.inf, -1, 0)] * len(points)
+        distances, indices = self.kd_tree.query(points)
+        return list(zip(distances.tolist(), indices.tolist(), [self.indexed] * len(points)))
+
+    def nearest(self, point, hint=None):
+        """
+        :param point: Query position
+        :param hint: tuple (distance, index, covered) of the closest of the first covered points, from index_hints
+            (possibly before more points were added)
+        :return: tuple (distance, index) of the closest point of the tree
+        """
+        if hint is not None:
+            best_distance, best_idx, covered = hint
+        elif self.kd_tree is not None:
+            best_distance, best_idx = self.kd_tree.query(point)
+            covered = self.indexed
+        else:
+            best_distance, best_idx, covered = math.inf, -1, 0
+
+        # Brute force over the points added since
+        if self.size > covered:
+            tail = self.points[covered:self.size]
+            dx, dy = tail[:, 0] - point[0], tail[:, 1] - point[1]
+            distances_sq = dx * dx + dy * dy
+            tail_idx = int(distances_sq.argmin())
+            if distances_sq[tail_idx] < best_distance * best_distance:
+                best_distance, best_idx = math.sqrt(distances_sq[tail_idx]), covered + tail_idx
+        return float(best_distance), int(best_idx)
+
+    def path_to_root(self, idx):
+        """
+        :param idx: Index of a point
+        :return: Array with the positions from that point up to the root, one per row
+        """
+        indices = [idx]
+        while self.parents[indices[-1]] != -1:
+            indices.append(self.parents[indices[-1]])
+        return self.points[indices].copy()
+
+    def nodes(self, path_resolution):
+        """
+        :param path_resolution: Spacing of the points of path_x and path_y
+        :return: List of Node views of every point, with parent links and the segment from the parent
+        """
+        nodes = [Node(x, y) for x, y in self.points[:self.size].tolist()]
+        for idx in range(1, self.size):
+            node, parent = nodes[idx], nodes[self.parents[idx]]
+            node.parent = parent
+            steps = max(int(math.ceil(math.hypot(node.x - parent.x, node.y - parent.y) / path_resolution)), 1)
+            node.path_x = np.linspace(parent.x, node.x, steps + 1).tolist()
+            node.path_y = np.linspace(parent.y, node.y, steps + 1).tolist()
+        return nodes
+
+
+class RRT:
+    """
+    Rapidly-exploring random tree planner over circle obstacles
+    """
+
+    # Random samples drawn at once
+    SAMPLE_BLOCK_SIZE = 1024
+    # RRTC gives up after drawing this many samples per allowed point
+    MAX_SAMPLES_PER_POINT = 10
+
+    def __init__(self, start=np.zeros(2), goal=np.array([120, 90]), obstacle_list=None, width=160, height=100,
+                 expand_dis=3.0, path_resolution=0.5, max_points=200, seed=None):
+        """
+        :param start: Start position
+        :param goal: Goal position
+        :param obstacle_list: List of Circle obstacles
+        :param width: Width of the sampling area, from x = 0
+        :param height: Height of the sampling area, from y = 0
+        :param expand_dis: Maximum length of a new edge
+        :param path_resolution: Spacing of the points of the path_x and path_y node views
+        :param max_points: Maximum number of sampling iterations
+        :param seed: Seed of the sampling generator
+        """
+        self.start = Node(start[0], start[1])
+        self.end = Node(goal[0], goal[1])
+        self.obstacle_list = [] if obstacle_list is None else obstacle_list
+        self.obstacles = CircleSet(self.obstacle_list, cell_size=expand_dis)
+        self.width = width
+        self.height = height
+        self.expand_dis = expand_dis
+        self.path_resolution = path_resolution
+        self.max_nodes = max_points
+        self.rng = np.random.default_rng(seed)
+        self.tree = SearchTree(np.array([self.start.x, self.start.y], dtype=float))
+
+    @property
+    def node_list(self):
+        """
+        :return: Node views of the tree
+        """
+        return self.tree.nodes(self.path_resolution)
+
+    def __random_points__(self, trees):
+        """
+        :param trees: SearchTrees to prepare nearest-neighbour hints for
+        :return: Generator of tuples (uniform sample in the sampling area, hint of every tree for it), drawn and
+            queried a block at a time
+        """
+        scale = np.array([self.width, self.height], dtype=float)
+        while True:
+            points = self.rng.random((self.SAMPLE_BLOCK_SIZE, 2)) * scale
+            hints = [tree.index_hints(points) for tree in trees]
+            for i, point in enumerate(points):
+                yield point, [tree_hints[i] for tree_hints in hints]
+
+    def steer(self, from_point, to_point, extend_length=math.inf):
+        """
+        :param from_point: Position to extend from
+        :param to_point: Position to extend towards
+        :param extend_length: Maximum extension
+        :return: Position reached, at most min(extend_length, expand_dis) away from from_point
+        """
+        direction = to_point - from_point
+        distance = math.hypot(direction[0], direction[1])
+        extend_length = min(extend_length, self.expand_dis)
+        if distance <= extend_length:
+            return to_point.copy()
+        return from_point + direction * (extend_length / distance)
+
+    def extend(self, tree, target, hint=None):
+        """
+        Extend a tree from its point closest to target
+        :param tree: SearchTree
+        :param target: Position to extend towards
+        :param hint: Nearest-neighbour hint of target (see SearchTree.nearest)
+        :return: Index of the new point, or -1 if the new edge is in collision
+        """
+        _, nearest_idx = tree.nearest(target, hint)
+        nearest = tree.points[nearest_idx]
+        new_point = self.steer(nearest, target)
+        if not self.obstacles.is_segment_free(nearest, new_point):
+            return -1
+        return tree.add(new_point, nearest_idx)
+
+    def planning(self):
+        """
+        Grow the tree until it reaches the goal or max_points samples have been drawn
+        :return: Array with the path from goal to start, one point per row, or None if no path was found
+        """
+        goal = np.array([self.end.x, self.end.y], dtype=float)
+        samples = self.__random_points__([self.tree])
+        for _ in range(self.max_nodes):
+            point, (hint,) = next(samples)
+            new_idx = self.extend(self.tree, point, hint)
+            if new_idx == -1:
+                continue
+
+            new_point = self.tree.points[new_idx]
+            if math.hypot(*(goal - new_point)) <= self.expand_dis and \
+                    self.obstacles.is_segment_free(new_point, goal):
+                return np.vstack((goal, self.tree.path_to_root(new_idx)))
+        return None
+
+
+class RRTC(RRT):
+    """
+    RRT-Connect planner: one tree grows from the start and one from the goal, towards each other
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Same arguments as RRT
+        """
+        super().__init__(*args, **kwargs)
+        self.end_tree = SearchTree(np.array([self.end.x, self.end.y], dtype=float))
+
+    @property
+    def start_node_list(self):
+        """
+        :return: Node views of the tree grown from the start
+        """
+        return self.tree.nodes(self.path_resolution)
+
+    @property
+    def end_node_list(self):
+        """
+        :return: Node views of the tree grown from the goal
+        """
+        return self.end_tree.nodes(self.path_resolution)
+
+    node_list = start_node_list
+
+    def planning(self):
+        """
+        Alternately extend the smaller tree towards a random sample and the other tree towards the new point,
+        until the trees connect or max_points points have been added
+        :return: Array with the path from start to goal, one point per row, or None if no path was found
+        """
+        if not (self.obstacles.is_segment_free(self.tree.points[0], self.tree.points[0]) and
+                self.obstacles.is_segment_free(self.end_tree.points[0], self.end_tree.points[0])):
+            # The start or the goal is inside an obstacle, the trees could never connect
+            return None
+        samples = self.__random_points__([self.tree, self.end_tree])
+        for _ in range(self.MAX_SAMPLES_PER_POINT * self.max_nodes):
+            if len(self.tree) + len(self.end_tree) > self.max_nodes:
+                break
+            point, hints = next(samples)
+            grow_start = len(self.tree) <= len(self.end_tree)
+            grow, other = (self.tree, self.end_tree) if grow_start else (self.end_tree, self.tree)
+
+            new_idx = self.extend(grow, point, hints[0] if grow_start else hints[1])
+            if new_idx == -1:
+                continue
+            new_point = grow.points[new_idx]
+
+            other_idx = self.extend(other, new_point)
+            if other_idx == -1:
+                continue
+            other_point = other.points[other_idx]
+
+            if math.hypot(*(new_point - other_point)) <= self.expand_dis and \
+                    self.obstacles.is_segment_free(new_point, other_point):
+                start_idx, end_idx = (new_idx, other_idx) if grow is self.tree else (other_idx, new_idx)
+                path = np.vstack((self.tree.path_to_root(start_idx)[::-1], self.end_tree.path_to_root(end_idx)))
+                # The trees usually meet at the same position, which would appear twice
+                return path[np.concatenate(([True], np.any(np.diff(path, axis=0) != 0, axis=1)))]
+        return None
@@ -0,0 +1,193 @@
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+from .envs.grid_env import GridEnv
+
+# Metrics reported by run_benchmarks, and whether larger values are better
+METRICS = {'construction_seconds': False, 'steps_per_second': True, 'q_values_seconds': False,
+           'peak_memory_bytes': False}
+
+
+def make_benchmark_env(size, noise=0.2, obstacle_density=0.1, seed=0):
+    """
+    Build a square grid world with randomly placed obstacles and two terminal states in opposite corners
+    :param size (int): Number of rows and columns of the grid
+    :param noise (float): Probability of a change of direction when an action is taken
+    :param obstacle_density (float): Fraction of cells that are obstacles
+    :param seed (int): Seed used to place the obstacles
+    :return GridEnv: Grid world environment
+    """
+    rng = np.random.default_rng(seed)
+    terminal_states = [(0, size - 1), (size - 1, 0)]
+
+    blocked = rng.random((size, size)) < obstacle_density
+    for cell in terminal_states:
+        blocked[cell] = False
+    obstacles = [tuple(cell) for cell in np.argwhere(blocked)]
+
+    return GridEnv(height=size, width=size, terminal_states=terminal_states, reward_terminal_states=[1.0, -1.0],
+                   obstacles=obstacles, noise=noise)
+
+
+def benchmark_construction(sizes=(10, 30, 100, 300, 1000), noise=0.2, repeats=3):
+    """
+    Measure how long GridEnv takes to build as the grid grows
+    :param sizes (iterable of ints): Grid side lengths to benchmark
+    :param noise (float): Probability of a change of direction when an action is taken
+    :param repeats (int): Number of constructions per size, the fastest one is reported
+    :return list of dicts: One entry per size with the number of states and construction time in seconds
+    """
+    results = []
+    for size in sizes:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            env = make_benchmark_env(size, noise=noise)
+            times.append(time.perf_counter() - start)
+
+        results.append({'size': size, 'states': env.observation_space.n, 'seconds': min(times)})
+    return results
+
+
+def benchmark_case(size, noise, steps=20000, repeats=3):
+    """
+    Measure construction time, step throughput, Q-value computation time and peak memory of one grid world
+    :param size (int): Grid side length
+    :param noise (float): Probability of a change of direction when an action is taken
+    :param steps (int): Number of GridEnv.step calls per repetition used to measure throughput
+    :param repeats (int): Number of repetitions of each timing, the fastest one is reported
+    :return dict: Measurements of this case (see METRICS)
+    """
+    # Peak memory of building the environment, measured separately so tracing does not slow down the timings
+    tracemalloc.start()
+    env = make_benchmark_env(size, noise=noise)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    construction = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        env = make_benchmark_env(size, noise=noise)
+        construction.append(time.perf_counter() - start)
+
+    rng = np.random.default_rng(0)
+    actions = rng.integers(env.action_space.n, size=steps)
+    stepping = []
+    for _ in range(repeats):
+        # Every repetition replays the same episodes
+        env.seed(0)
+        env.reset()
+        start = time.perf_counter()
+        for action in actions:
+            _, _, done, _ = env.step(action)
+            if done:
+                env.reset()
+        stepping.append(time.perf_counter() - start)
+
+    values = rng.random(env.observation_space.n)
+    q_values = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        env.get_q_value_array(values)
+        q_values.append(time.perf_counter() - start)
+
+    return {'size': size, 'noise': noise, 'states': env.observation_space.n,
+            'construction_seconds': min(construction), 'steps_per_second': steps / min(stepping),
+            'q_values_seconds': min(q_values), 'peak_memory_bytes': peak_memory}
+
+
+def run_benchmarks(sizes=(10, 30, 100, 300, 1000), noise_levels=(0.0, 0.2), steps=20000, repeats=3):
+    """
+    Run benchmark_case over a ladder of grid sizes and noise levels
+    :param sizes (iterable of ints): Grid side lengths
+    :param noise_levels (iterable of floats): Noise values
+    :param steps (int): Number of GridEnv.step calls used to measure throughput
+    :param repeats (int): Number of repetitions of each timing
+    :return list of dicts: One entry per (size, noise) pair
+    """
+    return [benchmark_case(size, noise, steps=steps, repeats=repeats) for size in sizes for noise in noise_levels]
+
+
+def save_results(results, path):
+    """
+    Write benchmark results as JSON, together with a description of the machine they were measured on
+    :param results: List returned by run_benchmarks
+    :param path: Destination file
+    """
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+              'results': results}
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(path):
+    """
+    Read benchmark results written by save_results
+    :param path: JSON file
+    :return list of dicts: Benchmark results
+    """
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Compare benchmark results against a baseline
+    :param results: List returned by run_benchmarks
+    :param baseline: List of baseline results (e.g. from load_results)
+    :param tolerance (float): Relative change tolerated before a metric counts as a regression
+    :return list of dicts: One entry per metric and case with the baseline value, the current value, the ratio
+                           between them and whether it is a regression
+    """
+    baseline = {(r['size'], r['noise']): r for r in baseline}
+    comparison = []
+    for r in results:
+        reference = baseline.get((r['size'], r['noise']))
+        if reference is None:
+            continue
+
+        for metric, higher_is_better in METRICS.items():
+            ratio = r[metric] / reference[metric] if reference[metric] else np.inf
+            regression = ratio < 1.0 - tolerance if higher_is_better else ratio > 1.0 + tolerance
+            comparison.append({'size': r['size'], 'noise': r['noise'], 'metric': metric,
+                               'baseline': reference[metric], 'current': r[metric], 'ratio': ratio,
+                               'regression': bool(regression)})
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the gym_simple_gridworlds environments")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 30, 100, 300, 1000])
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.2])
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Compare results against this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.noise, steps=args.steps, repeats=args.repeats)
+    for r in results:
+        print("{size:>5d}x{size:<5d} noise={noise:<4} {states:>9d} states  build {construction_seconds:8.4f} s  "
+              "{steps_per_second:>10.0f} steps/s  q-values {q_values_seconds:8.4f} s  "
+              "peak {peak_memory_bytes:>12d} B".format(**r))
+
+    if args.output:
+        save_results(results, args.output)
+
+    if args.baseline:
+        regressions = [c for c in compare_to_baseline(results, load_results(args.baseline), args.tolerance)
+                       if c['regression']]
+        for c in regressions:
+            print("REGRESSION {size}x{size} noise={noise} {metric}: {baseline:.4g} -> {current:.4g} "
+                  "({ratio:.2f}x)".format(**c))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
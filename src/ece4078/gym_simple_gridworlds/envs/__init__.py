@@ -1 +1,7 @@
-
+from .grid_env import GridEnv
+from .vector_grid_env import VectorGridEnv
+from .trajectory_buffer import TrajectoryBuffer, record_episodes
+from .rollout_collector import collect_rollouts
+from .grid_animation import GridAnimator, animate_trajectory, animate_value_iteration
+from . import solvers
+from . import q_learning
@@ -2,52 +2,80 @@ from matplotlib import pyplot as plt
 import numpy as np
 import matplotlib.colors
 
+# Per-cell text labels and grid lines are only drawn on maps up to these sizes, beyond that they hide the cells
+MAX_CELLS_WITH_LABELS = 400
+MAX_SIDE_WITH_GRID_LINES = 30
+MAX_TICKS = 20
 
-def plot_grid_world(grid_env):
+# Arrow (dx, dy) in plot coordinates of each action. 0: up, 1: down, 2: left, 3: right
+ARROW_DIRECTIONS = np.array([(0.0, 0.6), (0.0, -0.6), (-0.6, 0.0), (0.6, 0.0)])
+
+
+def get_cell_colors(grid_env):
     """
-    Generate plot of a grid world environment
+    Compute the RGBA colour of every cell of a grid world
     :param grid_env: Environment to be displayed
-    :return (fig, ax): Matplotlib objects on which plot is defined
+    :return: Array with dimensions height x width x 4
     """
     colors = {'wall': 'black', 'final_positive': 'green', 'final_negative': 'red',
               'cell': 'lightblue'
               }
-
     height, width = grid_env.grid.shape
+    image = np.zeros((height, width, 4))
+
+    image[...] = matplotlib.colors.to_rgba(colors['cell'])
+    image[grid_env.obstacle_mask] = matplotlib.colors.to_rgba(colors['wall'])
+
+    terminal_rewards = grid_env.immediate_rewards[grid_env.state_index[grid_env.terminal_mask]]
+    image[grid_env.terminal_mask] = np.where(terminal_rewards[:, None] > 0,
+                                             matplotlib.colors.to_rgba(colors['final_positive']),
+                                             matplotlib.colors.to_rgba(colors['final_negative']))
+    return image
+
+
+def draw_grid(ax, image):
+    """
+    Draw the cells of a grid world as a single image, plus its outline
+    :param ax: Matplotlib axes to draw on
+    :param image: Array with the RGBA colour of every cell (height x width x 4)
+    :return: Image artist holding the cells
+    """
+    height, width = image.shape[:2]
 
-    fig, ax = plt.subplots(figsize=(4, 4))
+    # Row 0 is drawn at the top, cell (i, j) covers [j, j + 1] x [height - 1 - i, height - i]
+    cells = ax.imshow(image, extent=(0, width, 0, height), origin='upper', interpolation='nearest', aspect='auto')
 
     # Draw grid outline
-    for col in range(width + 1):
-        ax.axvline(col, ymin=0, ymax=height)
-
-    for row in range(height + 1):
-        ax.axhline(row)
-
-    for i in range(height):
-        for j in range(width):
-            y = (height - 1) - i
-            if grid_env.is_obstacle(i, j):
-                wall = plt.Rectangle((j, y), width=1.0, height=1.0, color=colors['wall'])
-                ax.add_artist(wall)
-            elif grid_env.is_terminal_state(i, j):
-                s_idx = int(grid_env.grid[i, j])
-                color = 'final_positive' if grid_env.immediate_rewards[s_idx] > 0 else 'final_negative'
-                target = plt.Rectangle((j, y), width=1.0, height=1.0, color=colors[color])
-                ax.add_artist(target)
-            else:
-                cell = plt.Rectangle((j, y), width=1.0, height=1.0, color=colors['cell'])
-                ax.add_artist(cell)
-
-    ax.set_xticks(np.arange(0.5, width))
-    ax.set_xticklabels(np.arange(0, width), fontsize=8)
-    ax.set_yticks(np.arange(0.5, height))
-    ax.set_yticklabels(np.arange(0, height), fontsize=8)
+    if max(height, width) <= MAX_SIDE_WITH_GRID_LINES:
+        ax.vlines(np.arange(width + 1), 0, height)
+        ax.hlines(np.arange(height + 1), 0, width)
+
+    step_x = int(np.ceil(width / MAX_TICKS))
+    step_y = int(np.ceil(height / MAX_TICKS))
+    ax.set_xticks(np.arange(0.5, width, step_x))
+    ax.set_xticklabels(np.arange(0, width, step_x), fontsize=8)
+    ax.set_yticks(np.arange(0.5, height, step_y))
+    ax.set_yticklabels(np.arange(0, height, step_y), fontsize=8)
 
     ax.set_ylim(0, height)
     ax.set_xlim(0, width)
 
-    return fig, ax
+    return cells
+
+
+def plot_grid_world(grid_env, ax=None):
+    """
+    Generate plot of a grid world environment
+    :param grid_env: Environment to be displayed
+    :param ax: Matplotlib axes to draw on, a new figure is created if not given
+    :return (fig, ax): Matplotlib objects on which plot is defined
+    """
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(4, 4))
+
+    draw_grid(ax, get_cell_colors(grid_env))
+
+    return ax.figure, ax
 
 
 def get_state_to_plot(env):
@@ -61,6 +89,7 @@ def plot_value_function(grid_env, value_function, ax=None):
     Generate plot of a given value function for a grid world environment
     :param grid_env: Environment
     :param value_function: Value function to be displayed
+    :param ax: Matplotlib axes to draw on, a new figure is created if not given
     :return (fig, ax): Matplotlib objects on which plot is defined
     """
     cmap = plt.cm.coolwarm
@@ -71,39 +100,18 @@ def plot_value_function(grid_env, value_function, ax=None):
     if ax is None:
         fig, ax = plt.subplots(figsize=(4, 4))
 
-    # Draw grid outline
-    for col in range(width + 1):
-        ax.axvline(col, ymin=0, ymax=height)
-
-    for row in range(height + 1):
-        ax.axhline(row)
-
-    for i in range(height):
-        for j in range(width):
-            y = (height - 1) - i
-            if grid_env.is_obstacle(i, j):
-                wall = plt.Rectangle((j, y), width=1.0, height=1.0, color='k')
-                ax.add_artist(wall)
-            elif grid_env.is_terminal_state(i, j):
-                s_idx = int(grid_env.grid[i, j])
-                color = cmap(norm(grid_env.immediate_rewards[s_idx]))
-                target = plt.Rectangle((j, y), width=1.0, height=1.0, color=color)
-                ax.text(j + 0.3, y + 0.5, "%0.2f" % grid_env.immediate_rewards[s_idx], fontsize=10)
-                ax.add_artist(target)
-            else:
-                s_idx = int(grid_env.grid[i, j])
-                color = cmap(norm(value_function[s_idx]))
-                cell = plt.Rectangle((j, y), width=1.0, height=1.0, color=color)
-                ax.text(j+0.3, y+0.5, "%0.2f" % value_function[s_idx], fontsize=10)
-                ax.add_artist(cell)
-
-    ax.set_xticks(np.arange(0.5, width))
-    ax.set_xticklabels(np.arange(0, width), fontsize=8)
-    ax.set_yticks(np.arange(0.5, height))
-    ax.set_yticklabels(np.arange(0, height), fontsize=8)
+    values = np.asarray([value_function.get(s, 0.0) for s in range(grid_env.observation_space.n)]) \
+        if isinstance(value_function, dict) else np.asarray(value_function, dtype=float)
 
-    ax.set_ylim(0, height)
-    ax.set_xlim(0, width)
+    # Terminal states show their reward, every other state its value
+    shown = np.where(grid_env.state_is_terminal, grid_env.immediate_rewards, values)
+    image = cmap(norm(shown))[grid_env.state_index]
+    image[grid_env.obstacle_mask] = matplotlib.colors.to_rgba('k')
+    draw_grid(ax, image)
+
+    if height * width <= MAX_CELLS_WITH_LABELS:
+        for s, (i, j) in enumerate(grid_env.state_coords):
+            ax.text(j + 0.3, (height - 1) - i + 0.5, "%0.2f" % shown[s], fontsize=10)
 
     return ax
 
@@ -113,69 +121,24 @@ def plot_policy(grid_env, policy, ax=None):
     Generate plot of a given policy for a grid world environment
     :param grid_env: Environment
     :param policy: Policy to be displayed
+    :param ax: Matplotlib axes to draw on, a new figure is created if not given
     :return (fig, ax): Matplotlib objects on which plot is defined
     """
-
-    colors = {'wall': 'black', 'final_positive': 'green', 'final_negative': 'red',
-              'cell': 'lightblue'
-              }
-
     height, width = grid_env.grid.shape
     if ax is None:
         fig, ax = plt.subplots(figsize=(4, 4))
 
-    # Draw grid outline
-    for col in range(width + 1):
-        ax.axvline(col, ymin=0, ymax=height)
-
-    for row in range(height + 1):
-        ax.axhline(row)
-
-    def get_annotation_coordinates(a, x, y):
-        a_origin, a_end = (0, 0), (0, 0)
-        if a == 0:
-            a_origin = (x + 0.5, y + 0.2)
-            a_end = (x + 0.5, y + 0.8)
-        elif a == 1:
-            a_origin = (x + 0.5, y + 0.8)
-            a_end = (x + 0.5, y + 0.2)
-        elif a == 2:
-            a_origin = (x + 0.8, y + 0.5)
-            a_end = (x + 0.2, y + 0.5)
-        elif a == 3:
-            a_origin = (x + 0.2, y + 0.5)
-            a_end = (x + 0.8, y + 0.5)
-        else:
-            pass
-
-        return a_origin, a_end
-
-    for i in range(height):
-        for j in range(width):
-            y = (height - 1) - i
-            if grid_env.is_obstacle(i, j):
-                wall = plt.Rectangle((j, y), width=1.0, height=1.0, color=colors['wall'])
-                ax.add_artist(wall)
-            elif grid_env.is_terminal_state(i, j):
-                s_idx = int(grid_env.grid[i, j])
-                color = 'final_positive' if grid_env.immediate_rewards[s_idx] > 0 else 'final_negative'
-                target = plt.Rectangle((j, y), width=1.0, height=1.0, color=colors[color])
-                ax.add_artist(target)
-            else:
-                cell = plt.Rectangle((j, y), width=1.0, height=1.0, color=colors['cell'])
-                ax.add_artist(cell)
-                origin, end = get_annotation_coordinates(policy[i,j], j, y)
-
-                ax.annotate("", ha='center', va='center', xytext=origin,
-                            xy=end, arrowprops={'color': 'black', 'arrowstyle': "->",
-                                                 "linewidth": 2})
-
-    ax.set_xticks(np.arange(0.5, width))
-    ax.set_xticklabels(np.arange(0, width), fontsize=8)
-    ax.set_yticks(np.arange(0.5, height))
-    ax.set_yticklabels(np.arange(0, height), fontsize=8)
+    draw_grid(ax, get_cell_colors(grid_env))
 
-    ax.set_ylim(0, height)
-    ax.set_xlim(0, width)
+    # One arrow per non-terminal state, all drawn by a single quiver
+    policy = np.asarray(policy)
+    rows, cols = np.nonzero(~grid_env.obstacle_mask & ~grid_env.terminal_mask)
+    actions = policy[rows, cols].astype(np.int64)
+    valid = (actions >= 0) & (actions < len(ARROW_DIRECTIONS))
+    rows, cols, actions = rows[valid], cols[valid], actions[valid]
+
+    ax.quiver(cols + 0.5, (height - 1) - rows + 0.5, ARROW_DIRECTIONS[actions, 0], ARROW_DIRECTIONS[actions, 1],
+              angles='xy', scale_units='xy', scale=1, pivot='middle', color='black',
+              width=min(0.01, 0.5 / max(height, width)))
 
     return ax
@@ -0,0 +1,190 @@
+from matplotlib import pyplot as plt
+import matplotlib.animation as animation
+import matplotlib.colors
+import numpy as np
+from .grid_2dplot import get_cell_colors, draw_grid, ARROW_DIRECTIONS
+from .solvers import value_iteration, compute_q_values, policy_to_grid, transition_matrix
+
+
+class GridAnimator:
+
+    """Animated view of a grid world
+
+    The static grid is drawn once. Only the agent marker and, optionally, a value layer and a policy layer are
+    redrawn on each frame, using blitting when updated live.
+
+    This class has the following attributes
+
+    - grid_env: Environment being displayed
+    - fig, ax: Matplotlib objects on which the animation is drawn
+    - agent: Marker of the agent's position
+    - value_layer: Image holding the value of every cell (None unless values are shown)
+    - policy_layer: Quiver holding one arrow per non-terminal state (None unless a policy is shown)
+
+    """
+
+    def __init__(self, grid_env, ax=None, values=None, policy=None):
+        """
+        Draw the static grid and create the animated artists
+        :param grid_env: Environment to be displayed
+        :param ax: Matplotlib axes to draw on, a new figure is created if not given
+        :param values: Value of every state, to show a value layer from the start
+        :param policy: Action of every cell in the (height, width) layout, to show a policy layer from the start
+        """
+        self.grid_env = grid_env
+        if ax is None:
+            self.fig, self.ax = plt.subplots(figsize=(4, 4))
+        else:
+            self.fig, self.ax = ax.figure, ax
+
+        self.cmap = plt.cm.coolwarm
+        self.norm = matplotlib.colors.Normalize(vmin=-1, vmax=1)
+
+        height, width = grid_env.grid.shape
+        draw_grid(self.ax, get_cell_colors(grid_env))
+
+        self.value_layer = None
+        if values is not None:
+            self.value_layer = self.ax.imshow(self.__value_image__(values), extent=(0, width, 0, height),
+                                              origin='upper', interpolation='nearest', aspect='auto', animated=True)
+
+        # Arrows are placed on every non-terminal state, their direction is updated on each frame
+        self.policy_layer = None
+        self.policy_rows, self.policy_cols = np.nonzero(~grid_env.obstacle_mask & ~grid_env.terminal_mask)
+        if policy is not None:
+            u, v = self.__arrows__(policy)
+            self.policy_layer = self.ax.quiver(self.policy_cols + 0.5, (height - 1) - self.policy_rows + 0.5, u, v,
+                                               angles='xy', scale_units='xy', scale=1, pivot='middle', color='black',
+                                               width=min(0.01, 0.5 / max(height, width)), animated=True)
+
+        self.agent, = self.ax.plot([], [], 'o', color='orange', markersize=min(12, 200 / max(height, width)),
+                                   animated=True)
+        self.background = None
+
+    def __value_image__(self, values):
+        """
+        :param values: Value of every state
+        :return: RGBA image of the value layer (terminal states show their reward)
+        """
+        shown = np.where(self.grid_env.state_is_terminal, self.grid_env.immediate_rewards, values)
+        image = self.cmap(self.norm(shown))[self.grid_env.state_index]
+        image[self.grid_env.obstacle_mask] = matplotlib.colors.to_rgba('k')
+        return image
+
+    def __arrows__(self, policy):
+        """
+        :param policy: Action of every cell in the (height, width) layout
+        :return: Arrow components (u, v) of every non-terminal state
+        """
+        actions = np.asarray(policy)[self.policy_rows, self.policy_cols].astype(np.int64)
+        arrows = np.where(((actions >= 0) & (actions < len(ARROW_DIRECTIONS)))[:, None],
+                          ARROW_DIRECTIONS[np.clip(actions, 0, len(ARROW_DIRECTIONS) - 1)], 0.0)
+        return arrows[:, 0], arrows[:, 1]
+
+    @property
+    def artists(self):
+        """
+        :return: List of the animated artists
+        """
+        return [a for a in (self.value_layer, self.policy_layer, self.agent) if a is not None]
+
+    def update(self, state=None, values=None, policy=None):
+        """
+        Update the animated artists without redrawing anything
+        :param state: Index of the state where the agent is
+        :param values: Value of every state (ignored if there is no value layer)
+        :param policy: Action of every cell in the (height, width) layout (ignored if there is no policy layer)
+        :return: List of the animated artists
+        """
+        if state is not None:
+            row, col = self.grid_env.state_coords[int(state)]
+            height, _ = self.grid_env.grid.shape
+            self.agent.set_data([col + 0.5], [(height - 1) - row + 0.5])
+
+        if values is not None and self.value_layer is not None:
+            self.value_layer.set_data(self.__value_image__(values))
+
+        if policy is not None and self.policy_layer is not None:
+            self.policy_layer.set_UVC(*self.__arrows__(policy))
+
+        return self.artists
+
+    def draw(self, state=None, values=None, policy=None):
+        """
+        Update the animated artists and show them live, by blitting them over a saved copy of the static grid
+        :param state: Index of the state where the agent is
+        :param values: Value of every state
+        :param policy: Action of every cell in the (height, width) layout
+        """
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.ax.bbox)
+
+        self.update(state, values, policy)
+        canvas.restore_region(self.background)
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def replay(self, states, fps=30):
+        """
+        Animate a sequence of agent states (e.g. the 'state' column of a TrajectoryBuffer)
+        :param states: Sequence of state indices
+        :param fps: Frames per second
+        :return: matplotlib.animation.FuncAnimation
+        """
+        states = np.asarray(states)
+
+        def animate(i):
+            return self.update(state=states[i])
+
+        return animation.FuncAnimation(self.fig, animate, frames=len(states), interval=1000 / fps, blit=True,
+                                       repeat=False)
+
+    def replay_values(self, values_history, policies=None, fps=30):
+        """
+        Animate a sequence of value functions (and policies), e.g. the sweeps of a solver
+        :param values_history: Sequence of value arrays
+        :param policies: Sequence of policies in the (height, width) layout, one per value array
+        :param fps: Frames per second
+        :return: matplotlib.animation.FuncAnimation
+        """
+        def animate(i):
+            return self.update(values=values_history[i], policy=None if policies is None else policies[i])
+
+        return animation.FuncAnimation(self.fig, animate, frames=len(values_history), interval=1000 / fps,
+                                       blit=True, repeat=False)
+
+
+def animate_trajectory(grid_env, states, fps=30, ax=None):
+    """
+    Replay the states visited by an agent
+    :param grid_env: Environment the states belong to
+    :param states: Sequence of state indices (e.g. TrajectoryBuffer['state'])
+    :param fps: Frames per second
+    :param ax: Matplotlib axes to draw on, a new figure is created if not given
+    :return: matplotlib.animation.FuncAnimation
+    """
+    return GridAnimator(grid_env, ax=ax).replay(states, fps=fps)
+
+
+def animate_value_iteration(grid_env, fps=30, ax=None, **solver_kwargs):
+    """
+    Run value iteration and animate how the value function and greedy policy evolve across sweeps
+    :param grid_env: Environment to solve
+    :param fps: Frames per second
+    :param ax: Matplotlib axes to draw on, a new figure is created if not given
+    :param solver_kwargs: Arguments passed to solvers.value_iteration
+    :return: matplotlib.animation.FuncAnimation
+    """
+    values_history = []
+    value_iteration(grid_env, callback=lambda iteration, values: values_history.append(values), **solver_kwargs)
+
+    transitions = transition_matrix(grid_env)
+    policies = [policy_to_grid(grid_env, compute_q_values(grid_env, values, transitions=transitions).argmax(axis=1))
+                for values in values_history]
+
+    animator = GridAnimator(grid_env, ax=ax, values=values_history[0], policy=policies[0])
+    return animator.replay_values(values_history, policies, fps=fps)
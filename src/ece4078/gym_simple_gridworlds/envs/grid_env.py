@@ -1,11 +1,14 @@
 import gym
+import os
 import numpy as np
 import copy
 from gym import error, spaces, utils
 from gym.utils import seeding
 from .grid_2dplot import plot_grid_world, get_state_to_plot, plot_value_function
+from .map_loader import read_map, model_cache_key, DEFAULT_CACHE_DIR, OBSTACLE, POSITIVE_TERMINAL, NEGATIVE_TERMINAL
+from ...npz_storage import save_arrays, load_arrays
+from .grid_animation import GridAnimator
 from matplotlib import pyplot as plt
-import matplotlib.animation as animation
 
 
 class GridEnv(gym.Env):
@@ -18,20 +21,33 @@ class GridEnv(gym.Env):
     - gamma: discount factor
     - terminal_states: Grid coordinates of terminal states
     - obstacles: Grid coordinates of obstacles
+    - terminal_mask / obstacle_mask: Boolean grids flagging terminal states / obstacles
+    - state_index: Index of the state of every cell (-1 for obstacles)
+    - state_coords: Grid coordinates of every state (Matrix with dimensions number states x 2)
     - action_space: Discrete action space
     - observation_space: Discrete state space
     - noise: Probability of an noisy actions. A noisy action will result in a noise% chance of a change in direction
     - rewards: Reward function (Matrix with dimensions number states x number of actions)
     - immediate_rewards: Immediate reward received at each state. These values are used to define the reward function
-    - state_transitions: State transition function (Matrix with dimensions number states x number of actions x number states)
+    - transition_next_states: Successor states of each state-action pair (Matrix with dimensions number states x
+                              number of actions x MAX_SUCCESSORS)
+    - transition_probs: Probability of each successor in transition_next_states (same dimensions)
+    - transition_cumulative_probs: Cumulative sum of transition_probs over the successors, used to sample transitions
+    - state_transitions: Dense view of the state transition function (Matrix with dimensions number states x number of
+                         actions x number states). It is only built when accessed, so avoid it on large grids
     - cur_state: Current location of agent in the grid
 
     """
 
-    metadata = {'render.modes': ['human']}
+    metadata = {'render.modes': ['human', 'live']}
     reward_range = (-1, 1)
     # 0: up, 1: down, 2: left, 3: right
     ACTIONS = {0: (-1, 0), 1: (1, 0), 2: (0, -1), 3: (0, 1)}
+    # Intended direction plus the two perpendicular (noisy) directions
+    MAX_SUCCESSORS = 3
+    # Arrays making up a compiled model (see save_model / load_model)
+    MODEL_ARRAYS = ('obstacle_mask', 'terminal_mask', 'state_index', 'state_coords', 'immediate_rewards', 'rewards',
+                    'transition_next_states', 'transition_probs', 'transition_cumulative_probs')
 
     def __init__(self, height=3,
                  width=4,
@@ -68,47 +84,49 @@ class GridEnv(gym.Env):
         assert len(terminal_states) == len(reward_terminal_states)
 
         self.gamma = gamma
-        self.terminal_states = terminal_states
-        self.obstacles = obstacles
+
+        # Cell masks, so that obstacle and terminal lookups do not scan the lists above
+        self.obstacle_mask = np.zeros((height, width), dtype=bool)
+        self.terminal_mask = np.zeros((height, width), dtype=bool)
+        obstacle_cells = tuple(np.asarray(obstacles, dtype=np.int64).reshape(-1, 2).T)
+        terminal_cells = tuple(np.asarray(terminal_states, dtype=np.int64).reshape(-1, 2).T)
+        self.obstacle_mask[obstacle_cells] = True
+        self.terminal_mask[terminal_cells] = True
 
         # Set of valid actions
         self.action_space = spaces.Discrete(4)
 
         # Set of states
-        self.observation_space = spaces.Discrete((height * width) - len(self.obstacles))
+        self.observation_space = spaces.Discrete((height * width) - int(self.obstacle_mask.sum()))
 
-        self.grid = np.zeros((height, width))
         self.noise = noise
+        self.living_reward = living_reward
         self.np_random = None
 
-        idx = 0
-        for i in range(0, height):
-            for j in range(width):
-                if self.is_obstacle(i, j):
-                    self.grid[i, j] = np.nan
-                    continue
-                self.grid[i, j] = int(idx)
-                idx += 1
-
-        # Define transition matrix
-        self.state_transitions = np.zeros((self.observation_space.n, self.action_space.n, self.observation_space.n))
-
-        for i in range(height):
-            for j in range(width):
-                s = self.grid[i, j]
-                if np.isnan(s):
-                    continue
-
-                for a in self.ACTIONS.keys():
-                    self.state_transitions[int(s), a, :] = self.__calculate_transition_probability__(int(s), a)
+        # States are numbered row by row skipping obstacles. state_index maps (row, col) -> state (-1 for obstacles)
+        # and state_coords maps state -> (row, col)
+        self.state_index = np.full((height, width), -1, dtype=np.int64)
+        self.state_index[~self.obstacle_mask] = np.arange(self.observation_space.n)
+        self.state_coords = np.argwhere(~self.obstacle_mask)
+        self.state_is_terminal = self.terminal_mask[~self.obstacle_mask]
+        self.init_states = np.flatnonzero(~self.state_is_terminal)
+
+        self.grid = np.where(self.obstacle_mask, np.nan, self.state_index.astype(float))
+
+        # Define transition model. Each state-action pair has at most MAX_SUCCESSORS successors, so only those
+        # (and their probabilities) are stored. The dense (S x A x S) matrix is available through state_transitions
+        table_shape = (self.observation_space.n, self.action_space.n, self.MAX_SUCCESSORS)
+        self.transition_next_states = np.zeros(table_shape, dtype=np.int64)
+        self.transition_probs = np.zeros(table_shape)
+        self.transition_cumulative_probs = np.zeros(table_shape)
+        self.__dense_transitions = None
+        self.__compute_transitions__(np.arange(self.observation_space.n))
 
         # Define immediate rewards
         self.immediate_rewards = np.full(self.observation_space.n, living_reward)
 
         # Set rewards for final states
-        for r, (x, y) in zip(reward_terminal_states, self.terminal_states):
-            s = self.grid[x, y]
-            self.immediate_rewards[int(s)] = r
+        self.immediate_rewards[self.state_index[terminal_cells]] = reward_terminal_states
 
         # Define reward function based on immediate rewards
         self.rewards = np.full((self.observation_space.n, self.action_space.n), 0.0)
@@ -118,58 +136,151 @@ class GridEnv(gym.Env):
         self.cur_state = (2, 0)
         self.idx_cur_state = 7
 
-    def __calculate_transition_probability__(self, state, action):
+    @classmethod
+    def from_map(cls, source, positive_reward=1.0, negative_reward=-1.0, living_reward=-0.04, gamma=0.9, noise=0.0,
+                 cache_dir=None, use_cache=True):
         """
-        Determine probability of transition of any state given current state and the agent's action
-        :param state: Current state (cell) in the grid
-        :param action: Action to be applied at current state
-        :return: Array of dimension self.observation_space telling probability of transitioning from current_state to
-                 any other state given current action
+        Create a Grid World from a map description. The compiled model is cached on disk, keyed by the content of the
+        map and the parameters, so later calls only memory-map it
+        :param source: Path to a text (.txt/.map), NumPy (.npy) or image (.png) map, a list of text rows or an array of
+                       cell codes (see map_loader.read_map)
+        :param positive_reward (float): Reward of positive terminal states
+        :param negative_reward (float): Reward of negative terminal states
+        :param living_reward (float): Immediate reward agent receives at each time step
+        :param gamma (float): Discount factor
+        :param noise (float): Probability of a change of direction when an action is taken
+        :param cache_dir: Directory of the model cache (defaults to map_loader.DEFAULT_CACHE_DIR)
+        :param use_cache (bool): Whether to read and write the model cache
+        :return GridEnv: Grid world environment
+        """
+        codes = read_map(source)
+        params = dict(positive_reward=positive_reward, negative_reward=negative_reward,
+                      living_reward=living_reward, gamma=gamma, noise=noise)
+
+        cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
+        cache_path = os.path.join(cache_dir, 'gridenv-{}.npz'.format(model_cache_key(codes, **params)))
+        if use_cache and os.path.exists(cache_path):
+            return cls.load_model(cache_path)
+
+        terminal_cells = np.argwhere((codes == POSITIVE_TERMINAL) | (codes == NEGATIVE_TERMINAL))
+        env = cls(height=codes.shape[0], width=codes.shape[1],
+                  terminal_states=list(map(tuple, terminal_cells.tolist())),
+                  reward_terminal_states=np.where(codes[tuple(terminal_cells.T)] == POSITIVE_TERMINAL,
+                                                  positive_reward, negative_reward).tolist(),
+                  obstacles=list(map(tuple, np.argwhere(codes == OBSTACLE).tolist())),
+                  living_reward=living_reward, gamma=gamma, noise=noise)
+
+        if not use_cache:
+            return env
+
+        # Write to a temporary file first so that an interrupted run never leaves a truncated model behind
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            env.save_model(f)
+        os.replace(tmp_path, cache_path)
+        return cls.load_model(cache_path)
+
+    def save_model(self, path):
+        """
+        Save the compiled model (index maps, transitions and rewards) into an uncompressed .npz file
+        :param path: Destination file (or open binary file)
         """
-        x, y = np.argwhere(self.grid == state)[0]
-        prob = np.zeros(self.observation_space.n)
+        save_arrays(path, params=np.array([self.gamma, self.noise, self.living_reward]),
+                    **{name: getattr(self, name) for name in self.MODEL_ARRAYS})
 
-        if self.is_terminal_state(x, y):
-            prob[int(state)] = 1.0
-            return prob
+    @classmethod
+    def load_model(cls, path, mmap_mode='c'):
+        """
+        Create a Grid World from a model saved with save_model, without recomputing anything. Arrays are
+        memory-mapped copy-on-write, so the environment can still be edited without touching the file
+        :param path: .npz file written by save_model
+        :param mmap_mode: Mode passed to np.memmap, or None to read everything into memory
+        :return GridEnv: Grid world environment
+        """
+        arrays = load_arrays(path, mmap_mode=mmap_mode)
+
+        env = cls.__new__(cls)
+        for name in cls.MODEL_ARRAYS:
+            setattr(env, name, arrays[name])
+        env.gamma, env.noise, env.living_reward = (float(p) for p in arrays['params'])
 
-        possible_states = self.__get_reachable_states__(state)
+        env.action_space = spaces.Discrete(len(cls.ACTIONS))
+        env.grid = np.where(env.obstacle_mask, np.nan, env.state_index.astype(float))
+        env.np_random = None
+        env.__dense_transitions = None
 
-        next_s = possible_states[action]
-        prob[next_s] += 1.0 - self.noise
+        env.cur_state = (-1, -1)
+        env.__update_state_flags__()
+        env.seed()
+        env.cur_state, env.idx_cur_state = tuple(env.state_coords[env.init_states[0]]), int(env.init_states[0])
+        return env
 
-        if self.noise:
-            if action in (0, 1):
-                # If moving up or down, mdp transitions with noise/2.0 probability to left or right
-                prob[possible_states[2]] += self.noise / 2.0
-                prob[possible_states[3]] += self.noise / 2.0
-            else:
-                # If moving up or down, mdp transitions with noise/2.0 probability to up or down
-                prob[possible_states[0]] += self.noise / 2.0
-                prob[possible_states[1]] += self.noise / 2.0
+    def __compute_transitions__(self, states):
+        """
+        Fill the rows of the transition model of the given states with whole-array operations
+        :param states: Array of state indices whose transitions should be (re)computed
+        """
+        states = np.asarray(states, dtype=np.int64)
+        reachable = self.__get_reachable_states__(states)
+
+        # Column 0 is the intended direction, columns 1 and 2 are the directions perpendicular to it
+        perpendicular = {0: (2, 3), 1: (2, 3), 2: (0, 1), 3: (0, 1)}
+        probs = np.array([1.0 - self.noise, self.noise / 2.0, self.noise / 2.0])
+
+        next_states = np.empty((len(states), self.action_space.n, self.MAX_SUCCESSORS), dtype=np.int64)
+        for a, (left, right) in perpendicular.items():
+            next_states[:, a, :] = reachable[:, [a, left, right]]
+        next_probs = np.broadcast_to(probs, next_states.shape).copy()
+
+        # Merge repeated successors (e.g. bouncing off two walls) so that each one appears once
+        for j in range(1, self.MAX_SUCCESSORS):
+            for i in range(j):
+                repeated = (next_states[..., j] == next_states[..., i]) & (next_probs[..., i] > 0)
+                next_probs[..., i] += np.where(repeated, next_probs[..., j], 0.0)
+                next_probs[..., j] = np.where(repeated, 0.0, next_probs[..., j])
+
+        # Terminal states are absorbing
+        terminal = self.state_is_terminal[states]
+        next_states[terminal] = states[terminal, None, None]
+        next_probs[terminal] = [1.0, 0.0, 0.0]
+
+        self.transition_next_states[states] = next_states
+        self.transition_probs[states] = next_probs
+        self.transition_cumulative_probs[states] = np.cumsum(next_probs, axis=-1)
+        self.__dense_transitions = None
 
-        return prob
+    def __calculate_transition_probability__(self, state, action):
+        """
+        Determine probability of transition of any state given current state and the agent's action
+        :param state: Current state (cell) in the grid
+        :param action: Action to be applied at current state
+        :return: Tuple (next_states, probs) with the distinct states reachable from current_state given current
+                 action and the probability of transitioning to each of them
+        """
+        probs = self.transition_probs[int(state), action]
+        next_states = self.transition_next_states[int(state), action]
+        return list(next_states[probs > 0]), list(probs[probs > 0])
 
     def __get_reachable_states__(self, state):
         """
         Determine grid locations that are reachable from current state given the set of actions
-        :param state: Current state (cell) in the grid
-        :return: List with cell indices of states that are reachable from state s given action set
+        :param state: Current state (cell) in the grid, or array of states
+        :return: Array with cell indices of states that are reachable from state s given action set (one column per
+                 action)
         """
-        x, y = np.argwhere(self.grid == state)[0]
-        states = {}
+        rows, cols = self.state_coords[state].T
         height, width = self.grid.shape
+        states = np.empty(np.shape(state) + (self.action_space.n,), dtype=np.int64)
 
         for a, displacement in self.ACTIONS.items():
-            next_row = max(0, min(x + displacement[0], height - 1))
-            next_col = max(0, min(y + displacement[1], width - 1))
+            next_row = np.clip(rows + displacement[0], 0, height - 1)
+            next_col = np.clip(cols + displacement[1], 0, width - 1)
 
-            next_s = self.grid[next_row, next_col]
+            next_s = self.state_index[next_row, next_col]
 
-            if np.isnan(next_s):
-                next_s = state
-
-            states[a] = int(next_s)
+            # Moving into an obstacle leaves the agent where it is
+            states[..., a] = np.where(next_s < 0, state, next_s)
         return states
 
     def is_terminal_state(self, x, y):
@@ -179,7 +290,7 @@ class GridEnv(gym.Env):
         :param y: col index
         :return: Bool indicating if specified location is a terminal state
         """
-        return (x, y) in self.terminal_states
+        return bool(self.terminal_mask[x, y])
 
     def is_obstacle(self, x, y):
         """
@@ -188,7 +299,43 @@ class GridEnv(gym.Env):
         :param y: col index
         :return: Bool indicating if specified location is a terminal state
         """
-        return (x, y) in self.obstacles
+        return bool(self.obstacle_mask[x, y])
+
+    @property
+    def terminal_states(self):
+        """
+        :return: List with the grid coordinates (row, col) of terminal states
+        """
+        return list(map(tuple, np.argwhere(self.terminal_mask).tolist()))
+
+    @property
+    def obstacles(self):
+        """
+        :return: List with the grid coordinates (row, col) of obstacles
+        """
+        return list(map(tuple, np.argwhere(self.obstacle_mask).tolist()))
+
+    @property
+    def state_transitions(self):
+        """
+        Dense state transition function, built from the sparse transition model on first access
+        :return: Array with dimensions number states x number of actions x number states
+        """
+        if self.__dense_transitions is None:
+            self.__dense_transitions = self.get_dense_transitions()
+        return self.__dense_transitions
+
+    def get_dense_transitions(self):
+        """
+        Expand the sparse transition model into a dense matrix. Memory grows with the square of the number of states,
+        so this is only meant for small grids
+        :return: Array with dimensions number states x number of actions x number states
+        """
+        n_states, n_actions = self.observation_space.n, self.action_space.n
+        dense = np.zeros((n_states, n_actions, n_states))
+        s_idx, a_idx = np.meshgrid(np.arange(n_states), np.arange(n_actions), indexing='ij')
+        np.add.at(dense, (s_idx[..., None], a_idx[..., None], self.transition_next_states), self.transition_probs)
+        return dense
 
     def step(self, action):
         """
@@ -203,16 +350,19 @@ class GridEnv(gym.Env):
             info (dict): state transition probability value
         """
 
-        # Get transition probabilities given current state and agent's action
-        prob = self.state_transitions[int(self.idx_cur_state), action]
+        # Get successors and their transition probabilities given current state and agent's action
+        next_states = self.transition_next_states[int(self.idx_cur_state), action]
+        prob = self.transition_probs[int(self.idx_cur_state), action]
+        cumulative_prob = self.transition_cumulative_probs[int(self.idx_cur_state), action]
 
-        # Select state to transition to given transition probabilities
-        next_state = np.random.choice(np.arange(self.observation_space.n), 1, p=prob)
+        # Select state to transition to by inverting the cumulative distribution over the successors
+        k = min(int(np.searchsorted(cumulative_prob, self.np_random.random(), side='right')), self.MAX_SUCCESSORS - 1)
+        next_state = next_states[k]
 
         # Get (x,y) coordinates associated to that state
-        next_x, next_y = np.argwhere(self.grid == next_state)[0]
+        next_x, next_y = self.state_coords[next_state]
         # Have we reached terminal state
-        done = self.is_terminal_state(next_x, next_y)
+        done = bool(self.state_is_terminal[next_state])
 
         # Get reward
         reward = self.immediate_rewards[int(self.idx_cur_state)]
@@ -223,19 +373,15 @@ class GridEnv(gym.Env):
         self.cur_state = (next_x, next_y)
         self.idx_cur_state = int(next_state)
 
-        return self.idx_cur_state, reward, done, {'prob': prob[next_state]}
+        return self.idx_cur_state, reward, done, {'prob': prob[k]}
 
     def __select_init_state__(self):
         """
         Randomly select the initial state of the agent in the grid
         :return: Grid coordinates of initial state
         """
-        candidate = np.random.randint(self.observation_space.n)
-        x, y = np.argwhere(self.grid == candidate)[0]
-
-        while self.is_terminal_state(x, y):
-            candidate = np.random.randint(self.observation_space.n)
-            x, y = np.argwhere(self.grid == candidate)[0]
+        candidate = self.init_states[self.np_random.integers(len(self.init_states))]
+        x, y = self.state_coords[candidate]
 
         return (x,y), int(candidate)
 
@@ -250,13 +396,22 @@ class GridEnv(gym.Env):
     def render(self, mode='human'):
         """
         Render the environment
-        :param mode: Display mode (currently only human mode is supported)
-        :return:
+        :param mode: Display mode. 'human' draws the grid on a new figure. 'live' draws the grid once and, on later
+                     calls, only moves the agent marker (by blitting), which is fast enough to follow long episodes
+        :return (fig, ax): Matplotlib objects on which plot is defined
         """
+        if mode == 'live':
+            if getattr(self, 'animator', None) is None:
+                self.animator = GridAnimator(self)
+            self.animator.draw(state=self.idx_cur_state)
+            return self.animator.fig, self.animator.ax
+
         return plot_grid_world(self)
 
     def close(self):
-        pass
+        if getattr(self, 'animator', None) is not None:
+            plt.close(self.animator.fig)
+            self.animator = None
 
     def seed(self, seed=1):
         """Sets the seed for this env's random number generator(s).
@@ -270,20 +425,12 @@ class GridEnv(gym.Env):
         :param exclude_terminal: Bool indicating whether terminal states should be include in list
         :return: Returns the list of indices of non-terminal states.
         """
-        height, width = self.grid.shape
-        states = []
-        for i in range(height):
-            for j in range(width):
-                s = self.grid[i, j]
-                if np.isnan(s):
-                    continue
-
-                if self.is_terminal_state(i, j) and exclude_terminal:
-                    continue
+        states = np.arange(self.observation_space.n)
 
-                states.append(int(s))
+        if exclude_terminal:
+            states = states[~self.state_is_terminal]
 
-        return states
+        return states.tolist()
 
     def get_actions(self):
         """Get list of actions.
@@ -291,37 +438,215 @@ class GridEnv(gym.Env):
         """
         return list(self.ACTIONS.keys())
 
-    def __compute_reward_function__(self):
+    def __compute_reward_function__(self, states=None):
         """
         Determine reward function based on state transitions and immediate rewards
+        :param states: Array of state indices whose rewards should be (re)computed, all states by default
+        """
+        states = np.arange(self.observation_space.n) if states is None else np.asarray(states, dtype=np.int64)
+
+        # Expected immediate reward over the (at most MAX_SUCCESSORS) successors of each action
+        self.rewards[states] = np.sum(self.transition_probs[states] *
+                                      self.immediate_rewards[self.transition_next_states[states]], axis=-1)
+        self.rewards[states[self.state_is_terminal[states]]] = 0.0
+
+    def __neighbour_states__(self, x, y):
+        """
+        Determine the states whose transitions or rewards may depend on a given cell, i.e. the cell itself and the
+        cells next to it
+        :param x: row index
+        :param y: col index
+        :return: Array with the indices of those states
         """
         height, width = self.grid.shape
-        for i in range(height):
-            for j in range(width):
-                s = self.grid[i, j]
-                if np.isnan(s) or self.is_terminal_state(i, j):
-                    continue
+        cells = np.array([(x, y)] + [(x + dx, y + dy) for dx, dy in self.ACTIONS.values()])
+        cells = cells[(cells[:, 0] >= 0) & (cells[:, 0] < height) & (cells[:, 1] >= 0) & (cells[:, 1] < width)]
+
+        states = self.state_index[cells[:, 0], cells[:, 1]]
+        return np.unique(states[states >= 0])
 
-                for a in self.ACTIONS.keys():
-                    p = self.state_transitions[int(s), a, :]
+    def __update_state_flags__(self):
+        """
+        Refresh the per-state data derived from the cell masks after the map changes
+        """
+        self.state_is_terminal = self.terminal_mask[~self.obstacle_mask]
+        self.init_states = np.flatnonzero(~self.state_is_terminal)
+        self.observation_space = spaces.Discrete(len(self.state_coords))
 
-                    self.rewards[int(s), a] = np.dot(p, self.immediate_rewards)
+        # Keep the agent's index in sync with its cell, and move it to an initial state if its cell became an obstacle
+        if 0 <= self.cur_state[0] < self.grid.shape[0] and 0 <= self.cur_state[1] < self.grid.shape[1]:
+            self.idx_cur_state = int(self.state_index[tuple(self.cur_state)])
+            if self.idx_cur_state < 0:
+                self.reset()
 
-    def get_q_values(self, value_function):
+    def set_living_reward(self, living_reward):
         """
-        Given a state-value function, computes the corresponding action-value function
-        ":param value_function: Dict with values of all non-terminal states
-        :return dict of dict of floats: Value for each state-action pair
+        Change the immediate reward of all non-terminal states
+        :param living_reward (float): Immediate reward agent receives at each time step
+        :return: Array mapping each state index to its index after the change (the identity here)
+        """
+        self.living_reward = living_reward
+        self.immediate_rewards[~self.state_is_terminal] = living_reward
+        self.__compute_reward_function__()
+        return np.arange(self.observation_space.n)
+
+    def set_terminal_reward(self, x, y, reward):
+        """
+        Change the reward of a terminal state
+        :param x: row index
+        :param y: col index
+        :param reward (float): New reward of the terminal state
+        :return: Array mapping each state index to its index after the change (the identity here)
+        """
+        assert self.is_terminal_state(x, y)
+
+        self.immediate_rewards[self.state_index[x, y]] = reward
+        self.__compute_reward_function__(self.__neighbour_states__(x, y))
+        return np.arange(self.observation_space.n)
+
+    def add_terminal_state(self, x, y, reward):
+        """
+        Turn a cell into a terminal state, only updating the model of that state and of its neighbours
+        :param x: row index
+        :param y: col index
+        :param reward (float): Reward associated with the terminal state
+        :return: Array mapping each state index to its index after the change (the identity here)
+        """
+        assert not self.is_obstacle(x, y) and not self.is_terminal_state(x, y)
+
+        s = self.state_index[x, y]
+        self.terminal_mask[x, y] = True
+        self.__update_state_flags__()
+
+        self.immediate_rewards[s] = reward
+        self.__compute_transitions__([s])
+        self.__compute_reward_function__(self.__neighbour_states__(x, y))
+        return np.arange(self.observation_space.n)
+
+    def remove_terminal_state(self, x, y):
         """
-        states = self.get_states(exclude_terminal=True)
-        actions = np.arange(self.action_space.n)
+        Turn a terminal state into a regular one, only updating the model of that state and of its neighbours
+        :param x: row index
+        :param y: col index
+        :return: Array mapping each state index to its index after the change (the identity here)
+        """
+        assert self.is_terminal_state(x, y)
 
-        q_values = {s: {a: 0} for s in states for a in actions}
-        print(q_values)
+        s = self.state_index[x, y]
+        self.terminal_mask[x, y] = False
+        self.__update_state_flags__()
 
-        for s in states:
-            for a in actions:
-                q_values[s][a] = self.rewards[s, a] + self.gamma * \
-                                 np.max([value_function[n_s] * self.state_transitions[s, a, n_s] for n_s in states])
+        self.immediate_rewards[s] = self.living_reward
+        self.__compute_transitions__([s])
+        self.__compute_reward_function__(self.__neighbour_states__(x, y))
+        return np.arange(self.observation_space.n)
+
+    def add_obstacle(self, x, y):
+        """
+        Place an obstacle on a cell. The state of that cell is removed and the states after it are renumbered, but
+        only the transitions and rewards of the neighbouring states are recomputed
+        :param x: row index
+        :param y: col index
+        :return: Array mapping each state index to its index after the change (-1 for the removed state)
+        """
+        assert not self.is_obstacle(x, y)
+
+        self.terminal_mask[x, y] = False
+
+        s = self.state_index[x, y]
+        state_map = np.arange(self.observation_space.n)
+        state_map[s] = -1
+        state_map[s + 1:] -= 1
+
+        self.obstacle_mask[x, y] = True
+        self.state_index[self.state_index > s] -= 1
+        self.state_index[x, y] = -1
+        self.grid = np.where(self.obstacle_mask, np.nan, self.state_index.astype(float))
+
+        self.state_coords = np.delete(self.state_coords, s, axis=0)
+        self.immediate_rewards = np.delete(self.immediate_rewards, s)
+        self.rewards = np.delete(self.rewards, s, axis=0)
+        self.transition_next_states = state_map[np.delete(self.transition_next_states, s, axis=0)]
+        self.transition_probs = np.delete(self.transition_probs, s, axis=0)
+        self.transition_cumulative_probs = np.delete(self.transition_cumulative_probs, s, axis=0)
+        self.__update_state_flags__()
+
+        # Only the neighbours could move into the new obstacle
+        affected = self.__neighbour_states__(x, y)
+        self.__compute_transitions__(affected)
+        self.__compute_reward_function__(affected)
+        return state_map
+
+    def remove_obstacle(self, x, y):
+        """
+        Remove the obstacle of a cell. A new (non-terminal) state is inserted for that cell and the states after it
+        are renumbered, but only the transitions and rewards of the new state and its neighbours are computed
+        :param x: row index
+        :param y: col index
+        :return: Array mapping each state index to its index after the change
+        """
+        assert self.is_obstacle(x, y)
+
+        # States are numbered row by row, so the new state goes after every free cell that precedes it
+        width = self.grid.shape[1]
+        s = int(np.count_nonzero(~self.obstacle_mask.ravel()[:x * width + y]))
+        state_map = np.arange(self.observation_space.n)
+        state_map[s:] += 1
+
+        self.obstacle_mask[x, y] = False
+        self.state_index[self.state_index >= s] += 1
+        self.state_index[x, y] = s
+        self.grid = np.where(self.obstacle_mask, np.nan, self.state_index.astype(float))
+
+        self.state_coords = np.insert(self.state_coords, s, (x, y), axis=0)
+        self.immediate_rewards = np.insert(self.immediate_rewards, s, self.living_reward)
+        self.rewards = np.insert(self.rewards, s, 0.0, axis=0)
+        self.transition_next_states = np.insert(state_map[self.transition_next_states], s, s, axis=0)
+        self.transition_probs = np.insert(self.transition_probs, s, 0.0, axis=0)
+        self.transition_cumulative_probs = np.insert(self.transition_cumulative_probs, s, 0.0, axis=0)
+        self.__update_state_flags__()
+
+        affected = self.__neighbour_states__(x, y)
+        self.__compute_transitions__(affected)
+        self.__compute_reward_function__(affected)
+        return state_map
+
+    def remap_values(self, values, state_map, fill_value=0.0):
+        """
+        Carry a value function over to the states of the environment after a change of the map, so that solvers can
+        be warm-started with it (e.g. solvers.value_iteration(env, initial_values=...))
+        :param values: Array with the value of every state before the change
+        :param state_map: Array returned by the method that changed the map
+        :param fill_value: Value given to states that did not exist before the change
+        :return: Array with the value of every state after the change
+        """
+        new_values = np.full(self.observation_space.n, fill_value, dtype=float)
+        kept = state_map >= 0
+        new_values[state_map[kept]] = np.asarray(values, dtype=float)[kept]
+        return new_values
+
+    def get_q_value_array(self, value_function):
+        """
+        Given a state-value function, computes the corresponding action-value function of every state-action pair
+        :param value_function: Array with the value of every state (or dict with values of non-terminal states).
+                               Values of terminal states are ignored since their reward is already part of self.rewards
+        :return: Array with dimensions number states x number of actions
+        """
+        if isinstance(value_function, dict):
+            values = np.zeros(self.observation_space.n)
+            values[list(value_function.keys())] = list(value_function.values())
+        else:
+            values = np.array(value_function, dtype=float)
+        values[self.state_is_terminal] = 0.0
+
+        return self.rewards + self.gamma * np.sum(self.transition_probs * values[self.transition_next_states], axis=-1)
+
+    def get_q_values(self, value_function):
+        """
+        Given a state-value function, computes the corresponding action-value function
+        :param value_function: Dict (or array) with values of all non-terminal states
+        :return dict of dict of floats: Value for each non-terminal state-action pair
+        """
+        q_values = self.get_q_value_array(value_function)
 
-        return q_values
+        return {s: dict(enumerate(q_values[s].tolist())) for s in self.get_states(exclude_terminal=True)}
@@ -0,0 +1,93 @@
+import os
+import hashlib
+import numpy as np
+
+# Cell codes used for maps stored as NumPy arrays
+FREE, OBSTACLE, POSITIVE_TERMINAL, NEGATIVE_TERMINAL = 0, 1, 2, 3
+
+# Symbols used for maps stored as text
+ASCII_SYMBOLS = {'.': FREE, ' ': FREE, '#': OBSTACLE, '+': POSITIVE_TERMINAL, '-': NEGATIVE_TERMINAL}
+
+# Bump whenever the layout of the cached model changes
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ece4078', 'gridworlds')
+
+
+def parse_ascii_map(lines):
+    """
+    Convert a text map into cell codes. '#' is an obstacle, '.' (or a space) a free cell, '+' a positive terminal
+    state and '-' a negative terminal state
+    :param lines: List of strings, one per row
+    :return: Integer array of cell codes
+    """
+    lines = [line.rstrip('\n') for line in lines if line.strip()]
+    width = max(len(line) for line in lines)
+    try:
+        return np.array([[ASCII_SYMBOLS[c] for c in line.ljust(width, '.')] for line in lines], dtype=np.int8)
+    except KeyError as e:
+        raise ValueError("Unknown map symbol {}".format(e))
+
+
+def parse_image_map(image):
+    """
+    Convert an image into cell codes, using the colours of plot_grid_world: dark pixels are obstacles, green pixels
+    positive terminal states and red pixels negative terminal states. Every pixel is one cell
+    :param image: Array returned by matplotlib.pyplot.imread (grayscale or RGB(A))
+    :return: Integer array of cell codes
+    """
+    image = np.asarray(image, dtype=float)
+    if image.max() > 1.0:
+        image = image / 255.0
+
+    if image.ndim == 2:
+        return np.where(image < 0.5, OBSTACLE, FREE).astype(np.int8)
+
+    r, g, b = image[..., 0], image[..., 1], image[..., 2]
+    codes = np.full(r.shape, FREE, dtype=np.int8)
+    codes[(r < 0.5) & (g < 0.5) & (b < 0.5)] = OBSTACLE
+    codes[(g >= 0.5) & (r < 0.5) & (b < 0.5)] = POSITIVE_TERMINAL
+    codes[(r >= 0.5) & (g < 0.5) & (b < 0.5)] = NEGATIVE_TERMINAL
+    return codes
+
+
+def read_map(source):
+    """
+    Read a grid world map from a file or from memory
+    :param source: Path to a text (.txt/.map), NumPy (.npy) or image (.png) file, a list of text rows, or an array
+                   of cell codes (boolean arrays are treated as obstacle occupancy)
+    :return: Integer array of cell codes
+    """
+    if isinstance(source, (str, os.PathLike)):
+        extension = os.path.splitext(str(source))[1].lower()
+        if extension == '.npy':
+            source = np.load(source)
+        elif extension == '.png':
+            from matplotlib import pyplot as plt
+            return parse_image_map(plt.imread(source))
+        else:
+            with open(source) as f:
+                return parse_ascii_map(f.readlines())
+
+    if isinstance(source, (list, tuple)) and len(source) and isinstance(source[0], str):
+        return parse_ascii_map(source)
+
+    source = np.asarray(source)
+    if source.dtype == bool:
+        return np.where(source, OBSTACLE, FREE).astype(np.int8)
+    if not np.isin(source, (FREE, OBSTACLE, POSITIVE_TERMINAL, NEGATIVE_TERMINAL)).all():
+        raise ValueError("Map arrays may only contain the codes FREE, OBSTACLE, POSITIVE_TERMINAL and NEGATIVE_TERMINAL")
+    return source.astype(np.int8)
+
+
+def model_cache_key(codes, **params):
+    """
+    Content hash identifying the compiled model of a map
+    :param codes: Integer array of cell codes
+    :param params: Parameters the model depends on (noise, living_reward, gamma, ...)
+    :return: Hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((CACHE_VERSION, codes.shape, sorted(params.items()))).encode())
+    digest.update(np.ascontiguousarray(codes, dtype=np.int8).tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,209 @@
+import numpy as np
+
+# Uniform random numbers drawn per learner and time step: exploration, action, transition and reset
+DRAWS_PER_STEP = 4
+EXPLORATION_STRATEGIES = ('epsilon_greedy', 'softmax')
+
+
+def constant(value):
+    """
+    :param value: Value of the schedule
+    :return: Schedule (function of the time step) that always returns value
+    """
+    return lambda t: value
+
+
+def linear_decay(start, end, num_steps):
+    """
+    :param start: Value at the first time step
+    :param end: Value reached after num_steps steps and kept afterwards
+    :param num_steps: Number of steps of the decay
+    :return: Schedule (function of the time step) decaying linearly from start to end
+    """
+    return lambda t: start + (end - start) * min(t / num_steps, 1.0)
+
+
+def exponential_decay(start, end, rate):
+    """
+    :param start: Value at the first time step
+    :param end: Value the schedule converges to
+    :param rate: Fraction of the distance to end kept after each step
+    :return: Schedule (function of the time step) decaying exponentially from start to end
+    """
+    return lambda t: end + (start - end) * rate ** t
+
+
+def as_schedule(value):
+    """
+    :param value: Number or schedule
+    :return: Schedule (function of the time step)
+    """
+    return value if callable(value) else constant(value)
+
+
+def select_actions(q_rows, exploration, parameter, u_explore, u_action):
+    """
+    Pick one action per row of Q-values, using pre-drawn uniform random numbers
+    :param q_rows: Array with dimensions number of learners x number of actions
+    :param exploration: 'epsilon_greedy' or 'softmax'
+    :param parameter: Epsilon (for epsilon_greedy) or temperature (for softmax)
+    :param u_explore: Uniform numbers deciding whether to explore (epsilon_greedy only)
+    :param u_action: Uniform numbers choosing the action
+    :return: Array with the action of every learner
+    """
+    n_actions = q_rows.shape[-1]
+
+    if exploration == 'epsilon_greedy':
+        random_actions = np.minimum((u_action * n_actions).astype(np.int64), n_actions - 1)
+        return np.where(u_explore < parameter, random_actions, q_rows.argmax(axis=-1))
+
+    # Boltzmann distribution, sampled by inverting its (unnormalised) cumulative distribution
+    weights = np.exp((q_rows - q_rows.max(axis=-1, keepdims=True)) / parameter)
+    cumulative = np.cumsum(weights, axis=-1)
+    return np.minimum((u_action[..., None] * cumulative[..., -1:] >= cumulative).sum(axis=-1), n_actions - 1)
+
+
+def q_learning(grid_env, num_steps, num_learners=1, alpha=0.1, epsilon=0.1, temperature=1.0,
+               exploration='epsilon_greedy', gamma=None, max_episode_steps=None, seed=0, snapshot_every=None,
+               block_size=1024):
+    """
+    Tabular Q-learning with many independent learners advanced in lockstep. Every learner has its own agent, Q-table
+    and random generator (spawned from np.random.SeedSequence(seed)), so learner i follows exactly the same
+    trajectory as q_learning_reference with the same arguments
+    :param grid_env: GridEnv to learn on
+    :param num_steps: Number of time steps taken by every learner
+    :param num_learners: Number of independent learners
+    :param alpha: Learning rate (number or schedule of the time step)
+    :param epsilon: Exploration probability of epsilon_greedy (number or schedule)
+    :param temperature: Temperature of softmax (number or schedule)
+    :param exploration: 'epsilon_greedy' or 'softmax'
+    :param gamma: Discount factor (defaults to the environment's one)
+    :param max_episode_steps: Episodes are cut (without a terminal update) after this many steps, if given
+    :param seed: Root seed
+    :param snapshot_every: Copy the Q-tables every this many steps, if given
+    :param block_size: Number of time steps of random numbers drawn at once from each generator
+    :return: tuple (q_values, episode_returns, snapshots)
+
+        q_values (array): Q-tables with dimensions number of learners x number states x number of actions
+        episode_returns (list of lists): undiscounted return of every finished episode of every learner
+        snapshots (list of tuples): (time step, copy of the Q-tables)
+    """
+    assert exploration in EXPLORATION_STRATEGIES
+    gamma = grid_env.gamma if gamma is None else gamma
+    alpha, epsilon, temperature = as_schedule(alpha), as_schedule(epsilon), as_schedule(temperature)
+    rngs = [np.random.Generator(np.random.PCG64(s)) for s in np.random.SeedSequence(seed).spawn(num_learners)]
+
+    n_states, n_actions = grid_env.observation_space.n, grid_env.action_space.n
+    q_values = np.zeros((num_learners, n_states, n_actions))
+    learners = np.arange(num_learners)
+    init_states = grid_env.init_states
+
+    # Every learner draws its initial state from the reset number of the first row of its stream
+    uniforms = np.stack([rng.random((block_size, DRAWS_PER_STEP)) for rng in rngs])
+    states = init_states[np.minimum((uniforms[:, 0, 3] * len(init_states)).astype(np.int64), len(init_states) - 1)]
+    offset = 1
+
+    episode_returns = [[] for _ in learners]
+    returns = np.zeros(num_learners)
+    lengths = np.zeros(num_learners, dtype=np.int64)
+    snapshots = []
+
+    for t in range(num_steps):
+        if offset == block_size:
+            uniforms = np.stack([rng.random((block_size, DRAWS_PER_STEP)) for rng in rngs])
+            offset = 0
+        u = uniforms[:, offset]
+        offset += 1
+
+        parameter = epsilon(t) if exploration == 'epsilon_greedy' else temperature(t)
+        actions = select_actions(q_values[learners, states], exploration, parameter, u[:, 0], u[:, 1])
+
+        # Sample the transition of every learner as GridEnv.step does
+        cumulative = grid_env.transition_cumulative_probs[states, actions]
+        k = np.minimum((u[:, 2, None] >= cumulative).sum(axis=-1), cumulative.shape[-1] - 1)
+        next_states = grid_env.transition_next_states[states, actions, k]
+        dones = grid_env.state_is_terminal[next_states]
+        rewards = grid_env.immediate_rewards[states] + np.where(dones, grid_env.immediate_rewards[next_states], 0.0)
+
+        # Batched TD update, learners never collide since each one owns its table
+        targets = rewards + np.where(dones, 0.0, gamma * q_values[learners, next_states].max(axis=-1))
+        q_values[learners, states, actions] += alpha(t) * (targets - q_values[learners, states, actions])
+
+        returns += rewards
+        lengths += 1
+        ended = dones if max_episode_steps is None else dones | (lengths >= max_episode_steps)
+        for i in np.flatnonzero(ended):
+            episode_returns[i].append(float(returns[i]))
+
+        reset_states = init_states[np.minimum((u[:, 3] * len(init_states)).astype(np.int64), len(init_states) - 1)]
+        states = np.where(ended, reset_states, next_states)
+        returns[ended] = 0.0
+        lengths[ended] = 0
+
+        if snapshot_every and (t + 1) % snapshot_every == 0:
+            snapshots.append((t + 1, q_values.copy()))
+
+    return q_values, episode_returns, snapshots
+
+
+def q_learning_reference(grid_env, num_steps, num_learners=1, alpha=0.1, epsilon=0.1, temperature=1.0,
+                         exploration='epsilon_greedy', gamma=None, max_episode_steps=None, seed=0, snapshot_every=None,
+                         block_size=1024):
+    """
+    Scalar Q-learning, one learner and one transition at a time. Takes the same arguments and returns the same
+    results as q_learning (block_size is only accepted for symmetry), and is meant as a readable reference to check
+    it against
+    """
+    assert exploration in EXPLORATION_STRATEGIES
+    gamma = grid_env.gamma if gamma is None else gamma
+    alpha, epsilon, temperature = as_schedule(alpha), as_schedule(epsilon), as_schedule(temperature)
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_learners)
+
+    n_states, n_actions = grid_env.observation_space.n, grid_env.action_space.n
+    q_values = np.zeros((num_learners, n_states, n_actions))
+    init_states = grid_env.init_states
+    episode_returns = []
+    snapshots = {}
+
+    def draw_init_state(u):
+        return init_states[min(int(u * len(init_states)), len(init_states) - 1)]
+
+    for i, seed_sequence in enumerate(seed_sequences):
+        rng = np.random.Generator(np.random.PCG64(seed_sequence))
+        q = q_values[i]
+        returns = []
+
+        state = draw_init_state(rng.random(DRAWS_PER_STEP)[3])
+        episode_return, length = 0.0, 0
+
+        for t in range(num_steps):
+            u_explore, u_action, u_transition, u_reset = rng.random(DRAWS_PER_STEP)
+
+            parameter = epsilon(t) if exploration == 'epsilon_greedy' else temperature(t)
+            action = int(select_actions(q[state][None], exploration, parameter,
+                                        np.array([u_explore]), np.array([u_action]))[0])
+
+            cumulative = grid_env.transition_cumulative_probs[state, action]
+            k = min(int(np.sum(u_transition >= cumulative)), len(cumulative) - 1)
+            next_state = grid_env.transition_next_states[state, action, k]
+            done = bool(grid_env.state_is_terminal[next_state])
+            reward = grid_env.immediate_rewards[state] + (grid_env.immediate_rewards[next_state] if done else 0.0)
+
+            target = reward + (0.0 if done else gamma * np.max(q[next_state]))
+            q[state, action] += alpha(t) * (target - q[state, action])
+
+            episode_return += reward
+            length += 1
+            if done or (max_episode_steps is not None and length >= max_episode_steps):
+                returns.append(float(episode_return))
+                state = draw_init_state(u_reset)
+                episode_return, length = 0.0, 0
+            else:
+                state = next_state
+
+            if snapshot_every and (t + 1) % snapshot_every == 0:
+                snapshots.setdefault(t + 1, np.zeros_like(q_values))[i] = q
+
+        episode_returns.append(returns)
+
+    return q_values, episode_returns, sorted(snapshots.items(), key=lambda item: item[0])
@@ -0,0 +1,54 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .grid_env import GridEnv
+from .trajectory_buffer import TrajectoryBuffer, record_episodes
+
+
+def _collect_chunk(env_config, policy, num_episodes, max_steps, seed_sequence):
+    """
+    Run a share of the episodes of collect_rollouts in a worker process
+    :param env_config: Dict of GridEnv constructor arguments
+    :param policy: Action of every cell in the (height, width) layout, or one action per state
+    :param num_episodes: Number of episodes to run
+    :param max_steps: Maximum number of steps per episode
+    :param seed_sequence: np.random.SeedSequence of this chunk
+    :return: Dict with one array per TrajectoryBuffer field
+    """
+    env = GridEnv(**env_config)
+    env.np_random = np.random.Generator(np.random.PCG64(seed_sequence))
+
+    buffer = record_episodes(env, policy, num_episodes, max_steps=max_steps,
+                             buffer=TrajectoryBuffer(capacity=num_episodes * 8))
+    return {name: np.array(buffer[name]) for name in TrajectoryBuffer.FIELDS}
+
+
+def collect_rollouts(env_config, policy, num_episodes, max_steps=100, seed=0, num_workers=None):
+    """
+    Run episodes of a deterministic policy on a GridEnv across a pool of processes.
+    Episodes are split into one chunk per worker, and each chunk gets its own generator spawned from
+    np.random.SeedSequence(seed), so the result only depends on the seed and the number of workers
+    :param env_config: Dict of GridEnv constructor arguments
+    :param policy: Action of every cell in the (height, width) layout used by plot_policy, or one action per state
+    :param num_episodes: Total number of episodes to run
+    :param max_steps: Maximum number of steps per episode
+    :param seed: Root seed
+    :param num_workers: Number of processes, the number of CPUs by default (1 runs everything in this process)
+    :return: TrajectoryBuffer with the transitions of all episodes, in chunk order
+    """
+    num_workers = os.cpu_count() if num_workers is None else num_workers
+    episodes_per_chunk = [len(chunk) for chunk in np.array_split(np.arange(num_episodes), num_workers)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_workers)
+    chunk_args = [(env_config, policy, n, max_steps, seed_seq)
+                  for n, seed_seq in zip(episodes_per_chunk, seed_sequences)]
+
+    if num_workers == 1:
+        results = [_collect_chunk(*args) for args in chunk_args]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_collect_chunk, *zip(*chunk_args)))
+
+    buffer = TrajectoryBuffer(capacity=sum(len(result['state']) for result in results))
+    for result in results:
+        buffer.add_batch(*(result[name] for name in TrajectoryBuffer.FIELDS))
+    return buffer
@@ -0,0 +1,181 @@
+import numpy as np
+from scipy import sparse
+
+
+def transition_matrix(grid_env):
+    """
+    Build the transition model of a grid world as a sparse matrix
+    :param grid_env: GridEnv whose transition model is used
+    :return: CSR matrix with dimensions (number of actions x number states) x number states, where row a * S + s
+             holds the probability of reaching every state after taking action a at state s
+    """
+    n_states, n_actions, n_successors = grid_env.transition_probs.shape
+
+    # Action-major rows, so that maximising over actions reduces over contiguous blocks
+    probs = grid_env.transition_probs.transpose(1, 0, 2).ravel()
+    next_states = grid_env.transition_next_states.transpose(1, 0, 2).ravel()
+    row_ptr = np.arange(0, probs.size + 1, n_successors)
+
+    return sparse.csr_matrix((probs, next_states, row_ptr), shape=(n_actions * n_states, n_states))
+
+
+def compute_q_values(grid_env, values, gamma=None, transitions=None):
+    """
+    Compute the action-value function of every state-action pair from a state-value function
+    :param grid_env: GridEnv whose transition model and rewards are used
+    :param values: Array with the value of every state
+    :param gamma: Discount factor (defaults to the environment's one)
+    :param transitions: Matrix returned by transition_matrix, built from grid_env if not given
+    :return: Array with dimensions number states x number of actions (a transposed view of an actions x states array,
+             so reductions over actions stay cheap)
+    """
+    gamma = grid_env.gamma if gamma is None else gamma
+    transitions = transition_matrix(grid_env) if transitions is None else transitions
+
+    n_states, n_actions = grid_env.rewards.shape
+    expected_next_value = (transitions @ values).reshape(n_actions, n_states)
+    return (grid_env.rewards.T + gamma * expected_next_value).T
+
+
+def policy_to_grid(grid_env, actions):
+    """
+    Arrange a policy given per state into the (height, width) layout used by plot_policy
+    :param grid_env: GridEnv the policy belongs to
+    :param actions: Array with the action taken at every state
+    :return: Integer array with the action of every cell (-1 for obstacles and terminal states)
+    """
+    policy = np.full(grid_env.grid.shape, -1, dtype=np.int64)
+    policy[~grid_env.obstacle_mask] = np.where(grid_env.state_is_terminal, -1, actions)
+    return policy
+
+
+def policy_from_grid(grid_env, policy):
+    """
+    Convert a policy in the (height, width) layout used by plot_policy into one action per state
+    :param grid_env: GridEnv the policy belongs to
+    :param policy: Array with the action of every cell, or already one action per state
+    :return: Integer array with the action taken at every state
+    """
+    policy = np.asarray(policy)
+    if policy.shape == grid_env.grid.shape:
+        policy = policy[~grid_env.obstacle_mask]
+    return np.maximum(policy, 0).astype(np.int64)
+
+
+def value_iteration(grid_env, gamma=None, theta=1e-6, max_iterations=10000, initial_values=None, callback=None):
+    """
+    Synchronous value iteration where each sweep updates all states at once
+    :param grid_env: GridEnv to solve
+    :param gamma: Discount factor (defaults to the environment's one)
+    :param theta: Stop once the largest change of a state value in a sweep is below this threshold
+    :param max_iterations: Maximum number of sweeps
+    :param initial_values: Array used to start the iteration (e.g. a previous solution), zeros by default
+    :param callback: Function called as callback(iteration, values) after every sweep, e.g. to record or animate it
+    :return: tuple (values, policy, residuals)
+
+        values (array): value of every state
+        policy (array): greedy policy in the (height, width) layout used by plot_policy
+        residuals (list of floats): largest change of a state value at each sweep
+    """
+    n_states = grid_env.observation_space.n
+    transitions = transition_matrix(grid_env)
+    values = np.zeros(n_states) if initial_values is None else np.array(initial_values, dtype=float)
+    residuals = []
+
+    for _ in range(max_iterations):
+        new_values = compute_q_values(grid_env, values, gamma, transitions).max(axis=1)
+        residuals.append(float(np.max(np.abs(new_values - values))))
+        values = new_values
+        if callback is not None:
+            callback(len(residuals), values)
+        if residuals[-1] < theta:
+            break
+
+    actions = compute_q_values(grid_env, values, gamma, transitions).argmax(axis=1)
+    return values, policy_to_grid(grid_env, actions), residuals
+
+
+def policy_evaluation(grid_env, policy, gamma=None, theta=1e-6, max_iterations=10000, initial_values=None,
+                      transitions=None):
+    """
+    Synchronous iterative evaluation of a deterministic policy
+    :param grid_env: GridEnv the policy acts on
+    :param policy: Action of every cell in the (height, width) layout, or one action per state
+    :param gamma: Discount factor (defaults to the environment's one)
+    :param theta: Stop once the largest change of a state value in a sweep is below this threshold
+    :param max_iterations: Maximum number of sweeps
+    :param initial_values: Array used to start the iteration, zeros by default
+    :param transitions: Matrix returned by transition_matrix, built from grid_env if not given
+    :return: tuple (values, residuals)
+
+        values (array): value of every state under the policy
+        residuals (list of floats): largest change of a state value at each sweep
+    """
+    gamma = grid_env.gamma if gamma is None else gamma
+    actions = policy_from_grid(grid_env, policy)
+    states = np.arange(grid_env.observation_space.n)
+
+    # Restrict the model to the action chosen at each state
+    transitions = transition_matrix(grid_env) if transitions is None else transitions
+    transitions = transitions[actions * len(states) + states]
+    rewards = grid_env.rewards[states, actions]
+
+    values = np.zeros(len(states)) if initial_values is None else np.array(initial_values, dtype=float)
+    residuals = []
+
+    for _ in range(max_iterations):
+        new_values = rewards + gamma * (transitions @ values)
+        residuals.append(float(np.max(np.abs(new_values - values))))
+        values = new_values
+        if residuals[-1] < theta:
+            break
+
+    return values, residuals
+
+
+def policy_iteration(grid_env, gamma=None, theta=1e-6, max_iterations=1000, initial_policy=None,
+                     initial_values=None, callback=None):
+    """
+    Policy iteration alternating policy evaluation and greedy policy improvement
+    :param grid_env: GridEnv to solve
+    :param gamma: Discount factor (defaults to the environment's one)
+    :param theta: Convergence threshold of each policy evaluation
+    :param max_iterations: Maximum number of improvement steps
+    :param initial_policy: Policy to start from (any layout accepted by policy_evaluation), all zeros by default
+    :param initial_values: Array used to start the first policy evaluation, zeros by default
+    :param callback: Function called as callback(iteration, values) after every policy evaluation
+    :return: tuple (values, policy, residuals)
+
+        values (array): value of every state
+        policy (array): greedy policy in the (height, width) layout used by plot_policy
+        residuals (list of floats): largest change of a state value between consecutive evaluations
+    """
+    n_states = grid_env.observation_space.n
+    if initial_policy is None:
+        actions = np.zeros(n_states, dtype=np.int64)
+    else:
+        actions = policy_from_grid(grid_env, initial_policy)
+
+    transitions = transition_matrix(grid_env)
+    values = np.zeros(n_states) if initial_values is None else np.array(initial_values, dtype=float)
+    residuals = []
+
+    for _ in range(max_iterations):
+        new_values, _ = policy_evaluation(grid_env, actions, gamma, theta, initial_values=values,
+                                          transitions=transitions)
+        residuals.append(float(np.max(np.abs(new_values - values))))
+        values = new_values
+        if callback is not None:
+            callback(len(residuals), values)
+
+        # Keep the current action on ties so that the loop terminates
+        q_values = compute_q_values(grid_env, values, gamma, transitions)
+        new_actions = q_values.argmax(axis=1)
+        current = q_values[np.arange(n_states), actions]
+        new_actions = np.where(np.isclose(current, q_values.max(axis=1)), actions, new_actions)
+
+        if np.array_equal(new_actions, actions):
+            break
+        actions = new_actions
+
+    return values, policy_to_grid(grid_env, actions), residuals
@@ -0,0 +1,180 @@
+import numpy as np
+from ...npz_storage import save_arrays, load_arrays
+from .solvers import policy_from_grid
+
+
+class TrajectoryBuffer:
+
+    """Array-backed store of (state, action, reward, next_state, done, prob) transitions
+
+    Every field is kept in its own preallocated NumPy column, which doubles in size whenever it runs out of space.
+    With the default dtypes a transition takes 18 bytes.
+
+    This class has the following attributes
+
+    - columns: Dict with the column of every field (only the first len(buffer) rows are valid)
+    - size: Number of transitions stored
+
+    """
+
+    FIELDS = ('state', 'action', 'reward', 'next_state', 'done', 'prob')
+
+    def __init__(self, capacity=1024, state_dtype=np.int32):
+        """
+        Initialize an empty buffer
+        :param capacity (int): Number of transitions preallocated
+        :param state_dtype: Integer dtype used to store states (e.g. np.uint16 for grids with less than 65536 states)
+        """
+        dtypes = {'state': state_dtype, 'action': np.int8, 'reward': np.float32, 'next_state': state_dtype,
+                  'done': np.bool_, 'prob': np.float32}
+        self.columns = {name: np.empty(capacity, dtype=dtypes[name]) for name in self.FIELDS}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        """
+        :param name: Field name (one of FIELDS)
+        :return: Array with the stored values of that field
+        """
+        return self.columns[name][:self.size]
+
+    @property
+    def capacity(self):
+        return len(self.columns['state'])
+
+    @property
+    def nbytes(self):
+        return sum(column[:self.size].nbytes for column in self.columns.values())
+
+    def __reserve__(self, n):
+        """
+        Make room for n more transitions, doubling the capacity as many times as needed
+        :param n: Number of transitions about to be added
+        """
+        capacity = max(self.capacity, 1)
+        while self.size + n > capacity:
+            capacity *= 2
+
+        if capacity != self.capacity:
+            for name, column in self.columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+
+    def add(self, state, action, reward, next_state, done, prob=1.0):
+        """
+        Store a single transition
+        :param state: State where the action was taken
+        :param action: Action taken
+        :param reward: Reward received
+        :param next_state: State reached
+        :param done: Whether next_state is terminal
+        :param prob: Probability of the transition
+        """
+        self.__reserve__(1)
+        for name, value in zip(self.FIELDS, (state, action, reward, next_state, done, prob)):
+            self.columns[name][self.size] = value
+        self.size += 1
+
+    def add_batch(self, states, actions, rewards, next_states, dones, probs=1.0):
+        """
+        Store many transitions at once (e.g. the output of one VectorGridEnv.step)
+        :param states: Array of states where the actions were taken
+        :param actions: Array of actions taken
+        :param rewards: Array of rewards received
+        :param next_states: Array of states reached
+        :param dones: Array of flags indicating whether next_states are terminal
+        :param probs: Array of transition probabilities
+        """
+        n = len(states)
+        self.__reserve__(n)
+        for name, values in zip(self.FIELDS, (states, actions, rewards, next_states, dones, probs)):
+            self.columns[name][self.size:self.size + n] = values
+        self.size += n
+
+    def extend(self, other):
+        """
+        Append all the transitions stored in another buffer
+        :param other: TrajectoryBuffer
+        """
+        self.add_batch(*(other[name] for name in self.FIELDS))
+
+    def sample(self, batch_size, rng=None):
+        """
+        Draw a minibatch of transitions uniformly at random (with replacement)
+        :param batch_size: Number of transitions to draw
+        :param rng: np.random.Generator to use, a fresh one by default
+        :return: Dict with one array per field
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        idx = rng.integers(self.size, size=batch_size)
+        return {name: self.columns[name][idx] for name in self.FIELDS}
+
+    def minibatches(self, batch_size, shuffle=True, rng=None):
+        """
+        Iterate once over all the stored transitions in minibatches
+        :param batch_size: Number of transitions per minibatch
+        :param shuffle: Whether to visit the transitions in random order
+        :param rng: np.random.Generator used for shuffling, a fresh one by default
+        :return: Generator of dicts with one array per field
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        order = rng.permutation(self.size) if shuffle else np.arange(self.size)
+        for start in range(0, self.size, batch_size):
+            idx = order[start:start + batch_size]
+            yield {name: self.columns[name][idx] for name in self.FIELDS}
+
+    def episode_ends(self):
+        """
+        :return: Array with the index of the last transition of every finished episode
+        """
+        return np.flatnonzero(self['done'])
+
+    def save(self, path):
+        """
+        Save the stored transitions into an uncompressed .npz file
+        :param path: Destination file
+        """
+        save_arrays(path, **{name: self[name] for name in self.FIELDS})
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load transitions saved with save. Columns are memory-mapped, and only copied if new transitions are added
+        :param path: .npz file written by save
+        :param mmap_mode: Mode passed to np.memmap, or None to read everything into memory
+        :return: TrajectoryBuffer
+        """
+        arrays = load_arrays(path, mmap_mode=mmap_mode)
+        buffer = cls(capacity=0)
+        buffer.columns = {name: arrays[name] for name in cls.FIELDS}
+        buffer.size = len(arrays['state'])
+        return buffer
+
+
+def record_episodes(grid_env, policy, num_episodes, max_steps=100, buffer=None):
+    """
+    Run episodes of a deterministic policy on a GridEnv and record every transition
+    :param grid_env: GridEnv to run (its np_random is used, so call seed() first for reproducible rollouts)
+    :param policy: Action of every cell in the (height, width) layout used by plot_policy, or one action per state
+    :param num_episodes: Number of episodes to run
+    :param max_steps: Maximum number of steps per episode
+    :param buffer: TrajectoryBuffer to append to, a new one by default
+    :return: TrajectoryBuffer with the recorded transitions
+    """
+    actions = policy_from_grid(grid_env, policy)
+    buffer = TrajectoryBuffer() if buffer is None else buffer
+
+    for _ in range(num_episodes):
+        state = grid_env.reset()
+        for _ in range(max_steps):
+            action = actions[state]
+            next_state, reward, done, info = grid_env.step(action)
+            buffer.add(state, action, reward, next_state, done, info['prob'])
+            state = next_state
+            if done:
+                break
+
+    return buffer
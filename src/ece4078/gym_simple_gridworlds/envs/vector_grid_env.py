@@ -0,0 +1,91 @@
+import numpy as np
+from gym.utils import seeding
+
+
+class VectorGridEnv:
+
+    """Batched version of a Grid World MDP that advances many agents at once
+
+    All agents share the transition model of a GridEnv and are stepped together with whole-array operations.
+
+    This class has the following attributes
+
+    - env: GridEnv whose transition model and rewards are used
+    - num_envs: Number of agents simulated in parallel
+    - states: Current state index of every agent (integer array of length num_envs)
+    - action_space: Discrete action space (same as env)
+    - observation_space: Discrete state space (same as env)
+
+    """
+
+    def __init__(self, env, num_envs=1024, seed=1):
+        """
+        Initialize a batch of agents living in the same Grid World
+        :param env (GridEnv): Environment providing the transition model and rewards
+        :param num_envs (int): Number of agents simulated in parallel
+        :param seed (int): Seed for the random number generator shared by all agents
+        """
+        self.env = env
+        self.num_envs = num_envs
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+
+        self.states = np.zeros(num_envs, dtype=np.int64)
+        self.np_random = None
+        self.seed(seed)
+
+    def seed(self, seed=1):
+        """Sets the seed for the random number generator shared by all agents.
+        :return: Returns the list of seeds used in this env's random number generators.
+        """
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def __select_init_states__(self, n):
+        """
+        Randomly select non-terminal initial states
+        :param n (int): Number of states to draw
+        :return: Array with n state indices
+        """
+        return self.env.init_states[self.np_random.integers(len(self.env.init_states), size=n)]
+
+    def reset(self):
+        """Resets every agent to a random non-terminal state
+        :return Array with the initial state of every agent
+        """
+        self.states = self.__select_init_states__(self.num_envs)
+        return self.states.copy()
+
+    def step(self, actions):
+        """
+        Run one time step of the dynamics of every agent. Agents that reach a terminal state are reset automatically.
+        :param actions: Array with the index of the action of every agent (or a single action applied to all)
+        :return: tuple (observations, rewards, dones, info)
+
+            observations (int array): state of every agent after the step (already reset where done)
+            rewards (float array): reward received by every agent
+            dones (bool array): whether each agent reached a terminal state
+            info (dict): 'prob' with the probability of each sampled transition and 'final_observation' with the
+                         state reached before any automatic reset
+        """
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int64), self.states.shape)
+
+        # Sample the successor of every agent with a single uniform draw per agent
+        cumulative = self.env.transition_cumulative_probs[self.states, actions]
+        u = self.np_random.random(self.num_envs)
+        k = np.minimum((u[:, None] >= cumulative).sum(axis=-1), cumulative.shape[-1] - 1)
+
+        next_states = self.env.transition_next_states[self.states, actions, k]
+        prob = self.env.transition_probs[self.states, actions, k]
+
+        dones = self.env.state_is_terminal[next_states]
+
+        # Same reward convention as GridEnv.step
+        rewards = self.env.immediate_rewards[self.states] + \
+            np.where(dones, self.env.immediate_rewards[next_states], 0.0)
+
+        self.states = next_states.copy()
+        if dones.any():
+            self.states[dones] = self.__select_init_states__(int(dones.sum()))
+
+        return self.states.copy(), rewards, dones, {'prob': prob, 'final_observation': next_states}
@@ -0,0 +1,58 @@
+import os
+import struct
+import zipfile
+import numpy as np
+
+
+def save_arrays(path, **arrays):
+    """
+    Save arrays into an uncompressed .npz file, so that they can later be memory-mapped by load_arrays
+    :param path: Destination file, written as given (np.savez would add a .npz extension), or open binary file
+    :param arrays: Arrays to save, keyed by name
+    """
+    if not isinstance(path, (str, bytes, os.PathLike)):
+        np.savez(path, **arrays)
+        return
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_arrays(path, mmap_mode='r'):
+    """
+    Load the arrays stored in an uncompressed .npz file. Each array is memory-mapped straight from the archive,
+    so loading is almost instantaneous and only the parts that are accessed are read from disk
+    :param path: .npz file written by save_arrays (or np.savez)
+    :param mmap_mode: Mode passed to np.memmap, or None to read everything into memory
+    :return: Dict of arrays keyed by name
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+
+            if mmap_mode is None or info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            # Skip the local file header to reach the .npy header of the member
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject or int(np.prod(shape)) == 0:
+                # Object and empty arrays cannot be memory-mapped
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+
+            arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return arrays